@@ -0,0 +1,131 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_cleaner_finish import process_ufc_data
+
+
+'''
+Throughput of the chunked, vectorized cleaner against the original row-wise one.
+
+Run from the repository root:
+
+    python benchmarks/cleaner_throughput.py --rows 200000
+
+A seeded synthetic feed shaped like ufc-master.csv (the cleaned columns plus a wide
+block of unused stats columns) is written to a temporary directory, both cleaners
+process it, and the columns the original wrote are compared as text.
+'''
+
+
+def legacy_process_ufc_data(input_file, output_file):
+    # process_ufc_data as it was before the rewrite: whole file in memory, two row-wise applies
+    df = pd.read_csv(input_file)
+    selected_columns = df[['R_fighter', 'B_fighter', 'date', 'Winner', 'R_odds', 'B_odds', 'finish', 'finish_details']].copy()
+
+    def determine_win_type(row):
+        if row['finish'] == 'SUB':
+            return 'submission'
+        elif row['finish'] == 'KO/TKO':
+            return 'knockout'
+        elif row['finish'] in ['S-DEC', 'M-DEC']:
+            return 'split'
+        elif row['finish'] == 'U-DEC':
+            return 'unanimous'
+        elif row['finish'] == 'DQ':
+            return 'dq'
+        elif pd.isna(row['finish']):
+            return 'unknown'
+        else:
+            return 'other'
+
+    selected_columns['win_type'] = selected_columns.apply(determine_win_type, axis=1)
+
+    def determine_favorite(row):
+        if row['R_odds'] < row['B_odds']:
+            return 'Red'
+        elif row['R_odds'] > row['B_odds']:
+            return 'Blue'
+        else:
+            return 'Even'
+
+    selected_columns['Favorite'] = selected_columns.apply(determine_favorite, axis=1)
+    final_df = selected_columns.drop(columns=['R_odds', 'B_odds', 'finish', 'finish_details'])
+    final_df = final_df[['R_fighter', 'B_fighter', 'date', 'Winner', 'win_type', 'Favorite']]
+    final_df.iloc[::-1].to_csv(output_file, index=False)
+
+
+def write_raw_feed(path, rows, extra_columns=100, seed=0):
+    rng = np.random.default_rng(seed)
+    fighters = np.array([f'Fighter {i}' for i in range(max(2, rows // 5))], dtype=object)
+    dates = pd.date_range('1994-01-01', periods=max(1, rows // 12), freq='7D')
+    odds = rng.choice([-400, -250, -150, -110, 100, 120, 180, 300], size=(2, rows)).astype(float)
+    odds[rng.random((2, rows)) < 0.05] = np.nan
+    finish = rng.choice(np.array(['U-DEC', 'KO/TKO', 'SUB', 'S-DEC', 'M-DEC', 'DQ', 'Overturned', None], dtype=object),
+                        p=[0.36, 0.31, 0.18, 0.09, 0.01, 0.005, 0.005, 0.04], size=rows)
+    raw = {
+        'R_fighter': rng.choice(fighters, rows),
+        'B_fighter': rng.choice(fighters, rows),
+        'R_odds': odds[0],
+        'B_odds': odds[1],
+        'date': pd.DatetimeIndex(np.sort(rng.choice(dates, rows))[::-1]).strftime('%m/%d/%Y'),
+        'Winner': rng.choice(np.array(['Red', 'Blue'], dtype=object), rows, p=[0.58, 0.42]),
+        'finish': finish,
+        'finish_details': rng.choice(np.array(['Punch', 'Rear Naked Choke', None], dtype=object), rows),
+    }
+    for i in range(extra_columns):
+        raw[f'stat_{i}'] = rng.normal(size=rows).round(3)
+    pd.DataFrame(raw).to_csv(path, index=False)
+
+
+def measure(function, *args):
+    # Time a clean run, then run again under tracemalloc for the peak, since tracing slows pandas down
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the chunked cleaner with the original row-wise one')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--extra-columns', type=int, default=100)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        raw_file = os.path.join(workdir, 'ufc-master.csv')
+        write_raw_feed(raw_file, args.rows, args.extra_columns)
+        legacy_file = os.path.join(workdir, 'legacy.csv')
+        chunked_file = os.path.join(workdir, 'chunked.csv')
+
+        legacy_time, legacy_peak = measure(legacy_process_ufc_data, raw_file, legacy_file)
+        chunked_time, chunked_peak = measure(process_ufc_data, raw_file, chunked_file, args.chunksize)
+        # The cleaner now also keeps the odds, the columns the original wrote must match exactly
+        legacy = pd.read_csv(legacy_file, dtype=str, keep_default_na=False)
+        chunked = pd.read_csv(chunked_file, dtype=str, keep_default_na=False)
+        identical = chunked[legacy.columns].equals(legacy)
+
+    print(f'{args.rows} rows, {args.extra_columns} unused columns, outputs identical: {identical}')
+    print(f'{"cleaner":<10}{"seconds":>10}{"rows/s":>14}{"peak MB":>10}')
+    for name, elapsed, peak in [('row-wise', legacy_time, legacy_peak), ('chunked', chunked_time, chunked_peak)]:
+        print(f'{name:<10}{elapsed:>10.3f}{args.rows / elapsed:>14,.0f}{peak / 2 ** 20:>10.1f}')
+    print(f'speedup: {legacy_time / chunked_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
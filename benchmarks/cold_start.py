@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+'''
+Cold start of the command line and of the modules each command loads, against a budget.
+
+Run from the repository root:
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --repeat 10 --scale 2
+
+Every case starts a fresh interpreter, so the time includes Python's own start-up and
+every import, the way a scheduler launching a command pays for it. The fastest of
+--repeat runs is kept. Cases over their budget (times --scale, for slower machines),
+or that load a library only some commands need, are reported and the exit status is 1.
+'''
+
+
+# Libraries no command should pay for until it uses them (numba itself loads the top of scipy)
+LAZY_MODULES = ['matplotlib', 'sklearn', 'scipy.sparse', 'tqdm']
+
+# (case, python arguments, budget in seconds). The help and argument parsing load no
+# library at all, the imports are what each command loads before it starts working
+CASES = [
+    ('cli help', ['cli.py', '--help'], 0.15),
+    ('cli rate help', ['cli.py', 'rate', '--help'], 0.15),
+    ('clean import', ['-c', 'import data_cleaner_finish'], 1.0),
+    ('rate import', ['-c', 'import model_runner'], 1.5),
+    ('optimize import', ['-c', 'import parameter_optimizer'], 1.5),
+    ('compare import', ['-c', 'import betting_compare, comparative_analysis_finish'], 1.5),
+    ('live import', ['-c', 'import live_ratings'], 1.5),
+]
+
+# Appended to the import cases to report which lazy libraries they loaded
+LOADED = "; import sys; print(' '.join(m for m in {} if m in sys.modules))".format(LAZY_MODULES)
+
+
+def run_case(arguments, repeat):
+    # Fastest wall time of a fresh interpreter running the case, and the lazy libraries it loaded
+    if arguments[0] == '-c':
+        arguments = ['-c', arguments[1] + LOADED]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable] + arguments, cwd=ROOT, capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            raise RuntimeError(f"{' '.join(arguments)} failed:\n{process.stderr}")
+    loaded = process.stdout.split() if arguments[0] == '-c' else []
+    return min(timings), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the start-up time of the command line against a budget')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case, the fastest is kept')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies every budget')
+    parser.add_argument('--output', help='JSON file for the timings')
+    args = parser.parse_args()
+
+    # One untimed run so the timed ones read the modules from a warm disk cache
+    run_case(['-c', 'import model_runner, parameter_optimizer, comparative_analysis_finish'], 1)
+
+    print(f'{"case":<18}{"seconds":>10}{"budget":>10}')
+    results, failures = [], []
+    for name, arguments, budget in CASES:
+        seconds, loaded = run_case(arguments, args.repeat)
+        budget *= args.scale
+        results.append({'case': name, 'seconds': seconds, 'budget': budget, 'lazy_loaded': loaded})
+        print(f'{name:<18}{seconds:>10.3f}{budget:>10.3f}')
+        if seconds > budget:
+            failures.append(f'OVER BUDGET {name}: {seconds:.3f}s > {budget:.3f}s')
+        if loaded:
+            failures.append(f"EAGER IMPORT {name}: {', '.join(loaded)}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f'Results written to {args.output}')
+    for failure in failures:
+        print(failure)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import elo_finish_decay
+import elo_finish_k_factor
+import elo_finish_simple
+from betting_compare import filter_predictions
+from data_cleaner_finish import process_ufc_data
+from elo_engine import load_bouts, prepare_bouts
+from incorrect_predictions import filter_incorrect_elo_predictions
+from parameter_optimizer import calculate_accuracy_batch
+from synthetic_bouts import raw_feed, synthetic_bouts
+
+
+'''
+Benchmarks of every pipeline stage on seeded synthetic histories.
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py --sizes 10000 1000000 --output results.json
+    python benchmarks/run_benchmarks.py --sizes 10000 --baseline results.json
+
+Each size gets a synthetic raw feed and runs, in pipeline order: the cleaner, the three
+rating scripts, one optimizer evaluation (a single parameter set over all bouts) and the
+two prediction reports on the rating outputs. Results go to a JSON file together with
+the commit and library versions. With --baseline, cases more than --tolerance slower
+than the baseline's are reported and the exit status is 1.
+'''
+
+
+RATING_SCRIPTS = [
+    ('rate_simple', elo_finish_simple, 'elo_scores_with_finish_multiplier_simple.csv'),
+    ('rate_k_factor', elo_finish_k_factor, 'elo_scores_with_finish_multiplier_k.csv'),
+    ('rate_decay', elo_finish_decay, 'elo_scores_with_finish_multiplier_decay.csv'),
+]
+
+# Best parameters recorded in parameter_optimizer, in calculate_accuracy_batch order
+OPTIMIZER_PARAMETERS = (0.9, -101, 1.8, 1.8, 1, 1.4, 1.0, 1.0, 1.0, 301, 201, 1)
+
+CASES = ['clean'] + [name for name, _, _ in RATING_SCRIPTS] + ['optimize', 'report_betting', 'report_incorrect']
+
+
+def pipeline_cases(workdir):
+    # (name, function) for every case, each reading what the cases before it wrote
+    path = lambda name: os.path.join(workdir, name)
+    outputs = [path(output) for _, _, output in RATING_SCRIPTS]
+    cases = [('clean', lambda: process_ufc_data(path('raw.csv'), path('cleaned.csv')))]
+    for (name, script, _), output in zip(RATING_SCRIPTS, outputs):
+        cases.append((name, lambda script=script, output=output: script.calculate_elo(path('cleaned.csv'), output)))
+
+    bouts = {}
+    def optimize():
+        if 'bouts' not in bouts:  # Loading is timed by the rating cases, not here
+            bouts['bouts'] = prepare_bouts(load_bouts(path('cleaned.csv')))
+        return calculate_accuracy_batch(bouts['bouts'], *OPTIMIZER_PARAMETERS)
+    cases.append(('optimize', optimize))
+    cases.append(('report_betting', lambda: filter_predictions(outputs, path('correct_elo_wrong_odds.csv'),
+                                                               path('correct_odds_wrong_elo.csv'),
+                                                               path('model_disagreements.csv'))))
+    cases.append(('report_incorrect', lambda: filter_incorrect_elo_predictions(outputs, path('incorrect.csv'))))
+    return cases
+
+
+def run_size(n_bouts, seed, cases, repeat=1, memory=False):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        raw_feed(synthetic_bouts(n_bouts, seed), seed=seed).to_csv(os.path.join(workdir, 'raw.csv'), index=False)
+        for name, function in pipeline_cases(workdir):
+            if name not in cases:
+                continue
+            with contextlib.redirect_stdout(io.StringIO()):
+                if name == 'optimize':
+                    function()  # Keep the one-off bout preparation out of the timing
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    function()
+                    timings.append(time.perf_counter() - start)
+                peak = None
+                if memory:
+                    # A separate run, tracing slows pandas down too much to time it at once
+                    tracemalloc.start()
+                    function()
+                    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                    tracemalloc.stop()
+            seconds = min(timings)
+            results.append({'case': name, 'bouts': n_bouts, 'seconds': seconds,
+                            'bouts_per_second': n_bouts / seconds, 'peak_mb': peak})
+            print(f"{name:<18}{n_bouts:>12,}{seconds:>10.3f}{n_bouts / seconds:>14,.0f}"
+                  f"{'' if peak is None else f'{peak:>10.1f}'}")
+    return results
+
+
+def environment(seed):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'numba': numba_version,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+    }
+
+
+def regressions(results, baseline, tolerance):
+    # Cases slower than the baseline's time for the same size by more than tolerance
+    previous = {(r['case'], r['bouts']): r['seconds'] for r in baseline['results']}
+    slower = []
+    for result in results:
+        key = (result['case'], result['bouts'])
+        if key in previous and result['seconds'] > previous[key] * (1 + tolerance):
+            slower.append((key, previous[key], result['seconds']))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the rating pipeline on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000], help='bouts per run, e.g. 10000 1000000 10000000')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=CASES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case, the fastest is kept')
+    parser.add_argument('--memory', action='store_true', help='also record peak traced memory (one extra run)')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    args = parser.parse_args()
+
+    # Load the compiled kernels and warm the caches on a tiny history first
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_size(1000, args.seed, args.cases)
+
+    print(f'{"case":<18}{"bouts":>12}{"seconds":>10}{"bouts/s":>14}{"peak MB" if args.memory else "":>10}')
+    results = []
+    for n_bouts in args.sizes:
+        results.extend(run_size(n_bouts, args.seed, args.cases, args.repeat, args.memory))
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(args.seed), 'results': results}, f, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for (case, n_bouts), before, after in slower:
+            print(f'REGRESSION {case} at {n_bouts:,} bouts: {before:.3f}s -> {after:.3f}s ({after / before:.2f}x)')
+        if slower:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
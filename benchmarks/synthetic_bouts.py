@@ -0,0 +1,136 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+
+'''
+Seeded synthetic bout histories at any scale, shaped like cleaned_ufc_data_with_finish.csv.
+
+The generator follows the real file's activity profile: about 5.6 bouts per fighter with
+a long tail (many one-fight careers, a few fighters with 30+), around six months between
+a fighter's bouts, weekly cards of about a dozen bouts, the red corner winning 58% of the
+time, the betting favorite tracking a hidden skill, and the real mix of win types.
+Histories too long for weekly cards within MAX_WEEKS put more bouts on every date, as if
+several promotions ran cards the same night.
+
+    python benchmarks/synthetic_bouts.py 1000000 synthetic_1m.csv --seed 0
+'''
+
+
+WIN_TYPES = ['unanimous', 'knockout', 'submission', 'split', 'unknown', 'dq', 'other']
+WIN_TYPE_SHARES = [0.3632, 0.3053, 0.1744, 0.1052, 0.0486, 0.0029, 0.0004]
+
+# Raw feed 'finish' code for each win type, the inverse of data_cleaner_finish.WIN_TYPES
+FINISH_CODES = {'unanimous': 'U-DEC', 'knockout': 'KO/TKO', 'submission': 'SUB', 'split': 'S-DEC', 'dq': 'DQ',
+                'other': 'Overturned', 'unknown': None}
+
+FIGHTS_PER_FIGHTER = 5.6
+BOUTS_PER_CARD = 11.4
+DAYS_BETWEEN_FIGHTS = 180
+RED_ADVANTAGE = 0.33
+START_DATE = np.datetime64('1994-01-01')
+MAX_WEEKS = 52 * 40
+
+
+def _career_slots(n_bouts, rng):
+    # Fighter id of every corner slot (two per bout), each fighter's slots in order
+    slots = 2 * n_bouts
+    n_fighters = int(slots / FIGHTS_PER_FIGHTER * 1.2) + 2
+    while True:
+        fights = rng.geometric(1 / FIGHTS_PER_FIGHTER, n_fighters)
+        if fights.sum() >= slots:
+            break
+        n_fighters *= 2
+    last = np.searchsorted(np.cumsum(fights), slots)
+    fights = fights[:last + 1]
+    fights[-1] -= fights.sum() - slots
+    return np.repeat(np.arange(len(fights)), fights), fights
+
+
+def synthetic_bouts(n_bouts, seed=0):
+    # Cleaned bout frame with n_bouts rows, latest card first like the cleaner's output
+    rng = np.random.default_rng(seed)
+    fighter, fights = _career_slots(n_bouts, rng)
+    n_fighters = len(fights)
+    n_weeks = min(max(1, int(round(n_bouts / BOUTS_PER_CARD))), MAX_WEEKS)
+    span = n_weeks * 7
+
+    # Days between a fighter's bouts, each career placed at random inside the timeline
+    gaps = rng.gamma(2.0, DAYS_BETWEEN_FIGHTS / 2, len(fighter))
+    first = np.concatenate([[0], np.cumsum(fights)[:-1]])
+    gaps[first] = 0
+    offsets = np.cumsum(gaps)
+    offsets -= np.repeat(offsets[first], fights)
+    career = np.repeat(offsets[first + fights - 1], fights)
+    start = np.repeat(rng.random(n_fighters), fights) * np.maximum(span - career, 0)
+    card = np.minimum((start + offsets) // 7, n_weeks - 1).astype(np.int64)
+
+    # Pair up the slots of each card in random order, a fighter never facing themselves
+    order = np.lexsort((rng.random(len(fighter)), card))
+    fighter, card = fighter[order], card[order]
+    red, blue = fighter[0::2].copy(), fighter[1::2].copy()
+    for _ in range(10):
+        clash = np.flatnonzero(red == blue)
+        if not len(clash):
+            break
+        partner = (clash + 1) % len(blue)
+        blue[clash], blue[partner] = blue[partner], blue[clash].copy()
+    bout_card = np.maximum(card[0::2], card[1::2])
+
+    skill = rng.normal(size=n_fighters)
+    edge = skill[red] - skill[blue]
+    red_wins = rng.random(n_bouts) < 1 / (1 + np.exp(-(edge + RED_ADVANTAGE)))
+    market = edge + RED_ADVANTAGE + rng.normal(0, 0.7, n_bouts)
+    favorite = np.where(market > 0, 'Red', 'Blue').astype(object)
+    favorite[rng.random(n_bouts) < 0.02] = 'Even'
+
+    names = pd.Index([f'Fighter {i}' for i in range(n_fighters)])
+    dates = pd.DatetimeIndex(START_DATE + np.arange(n_weeks) * 7).strftime('%m/%d/%Y').to_numpy(dtype=object)
+    df = pd.DataFrame({
+        'R_fighter': pd.Categorical.from_codes(red, names),
+        'B_fighter': pd.Categorical.from_codes(blue, names),
+        'date': dates[bout_card],
+        'Winner': np.where(red_wins, 'Red', 'Blue'),
+        'win_type': rng.choice(WIN_TYPES, n_bouts, p=WIN_TYPE_SHARES),
+        'Favorite': favorite,
+    })
+    return df.iloc[np.argsort(-bout_card, kind='stable')].reset_index(drop=True)
+
+
+def raw_feed(df, extra_columns=20, seed=0):
+    # ufc-master.csv style feed that process_ufc_data cleans back into df
+    rng = np.random.default_rng(seed)
+    n = len(df)
+    favorite = df['Favorite'].to_numpy()
+    short, long = -rng.choice([110, 150, 250, 400], n).astype(float), rng.choice([100, 130, 200, 320], n).astype(float)
+    even = rng.choice([-110, 100], n).astype(float)
+    raw = pd.DataFrame({
+        'R_fighter': df['R_fighter'],
+        'B_fighter': df['B_fighter'],
+        'R_odds': np.select([favorite == 'Red', favorite == 'Blue'], [short, long], even),
+        'B_odds': np.select([favorite == 'Red', favorite == 'Blue'], [long, short], even),
+        'date': df['date'],
+        'Winner': df['Winner'],
+        'finish': df['win_type'].map(FINISH_CODES),
+    })
+    for i in range(extra_columns):
+        raw[f'stat_{i}'] = rng.normal(size=n).round(3)
+    # The feed lists bouts oldest first, the cleaner reverses them
+    return raw.iloc[::-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a seeded synthetic bout history')
+    parser.add_argument('bouts', type=int)
+    parser.add_argument('output_file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--raw', action='store_true', help='write a raw feed for the cleaner instead')
+    args = parser.parse_args()
+
+    df = synthetic_bouts(args.bouts, args.seed)
+    (raw_feed(df, seed=args.seed) if args.raw else df).to_csv(args.output_file, index=False)
+    print(f'{args.bouts} synthetic bouts written to {args.output_file}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import numpy as np
+from collections import namedtuple
+
+from elo_engine import BLUE, DEFAULT_ELO, NO_WINNER, RATING_DTYPE
+from glicko_engine import card_starts
+from instrumentation import profiled
+
+
+'''
+Bradley-Terry ratings fitted to the whole bout history at once.
+
+Each fighter has a strength g and red beats blue with probability g_red / (g_red + g_blue),
+which is the Elo expected score for ratings DEFAULT_ELO + 400 * log10(g). The strengths
+are the maximum-likelihood fit found by Hunter's MM iteration, one sparse
+(fighters x bouts) product per step. Every fighter also gets prior virtual games, a win
+and a loss against a strength 1 fighter, so the fit exists for unbeaten and winless
+fighters alike and a debut sits at DEFAULT_ELO.
+
+Older bouts can count for less: with half_life set, a bout's weight halves for every
+half_life days between it and the fit date, the same idea as the decay model's
+inactivity penalty. A fit can start from an earlier one, which makes refitting after
+each card a matter of a few iterations.
+'''
+
+
+# Strengths of every fighter in bouts.fighters order, their ratings on the Elo scale and the MM iterations used
+BradleyTerryFit = namedtuple('BradleyTerryFit', ['fighters', 'strengths', 'ratings', 'iterations'])
+
+# Per-bout ratings from fits made before and after each card, like an Elo replay
+BradleyTerryReplay = namedtuple('BradleyTerryReplay', ['red_initial', 'blue_initial', 'red_new', 'blue_new', 'ratings'])
+
+
+def incidence(bouts, winner=None):
+    # Winner and loser ids of every bout, and the sparse (fighters x bouts) matrices with a 1
+    # for the winner and for both fighters of every bout. Bouts without a winner get a column of zeros
+    from scipy import sparse  # Imported on first use so loading the model runner stays quick
+
+    if winner is None:
+        winner = bouts.winner
+    winner = np.asarray(winner)
+    n = len(bouts.red)
+    decided = winner != NO_WINNER
+    w = np.where(winner == BLUE, bouts.blue, bouts.red)
+    l = np.where(winner == BLUE, bouts.red, bouts.blue)
+    shape = (len(bouts.fighters), n)
+    bout = np.arange(n)
+    wins = sparse.csr_matrix((decided.astype(np.float64), (w, bout)), shape=shape)
+    played = sparse.csr_matrix((np.concatenate([decided, decided]).astype(np.float64),
+                                (np.concatenate([w, l]), np.concatenate([bout, bout]))), shape=shape)
+    return w, l, wins, played
+
+
+def bout_weights(day, on, half_life=None, mask=None):
+    # Weight of every bout for a fit made on day on, bouts outside mask count for nothing
+    weights = np.ones(len(day)) if half_life is None else 0.5 ** ((on - np.asarray(day)) / half_life)
+    return weights if mask is None else weights * mask
+
+
+def fit_strengths(w, l, wins, played, weights, prior=1.0, strengths=None, tol=1e-8, max_iterations=10_000):
+    # MM iteration for the weighted Bradley-Terry fit with prior virtual games.
+    # Returns the strengths and the number of iterations
+    if strengths is None:
+        strengths = np.ones(wins.shape[0])
+    won = wins @ weights + prior
+    for iteration in range(1, max_iterations + 1):
+        per_bout = weights / (strengths[w] + strengths[l])
+        updated = won / (played @ per_bout + 2 * prior / (strengths + 1))
+        change = np.max(np.abs(np.log(updated / strengths))) if len(updated) else 0.0
+        strengths = updated
+        if change < tol:
+            break
+    return strengths, iteration
+
+
+def to_ratings(strengths):
+    return DEFAULT_ELO + 400 * np.log10(strengths)
+
+
+def fit(bouts, half_life=None, prior=1.0, on=None, warm_start=None, winner=None, tol=1e-8):
+    # Fit every fighter's strength to all the bouts, weighted as of day on (the last bout's day
+    # by default). warm_start is an earlier BradleyTerryFit, matched to these bouts by fighter name
+    w, l, wins, played = incidence(bouts, winner)
+    if on is None:
+        on = int(bouts.day.max()) if len(bouts.day) else 0
+    strengths = None
+    if warm_start is not None:
+        previous = dict(zip(warm_start.fighters, warm_start.strengths))
+        strengths = np.array([previous.get(fighter, 1.0) for fighter in bouts.fighters])
+    strengths, iterations = fit_strengths(w, l, wins, played, bout_weights(bouts.day, on, half_life),
+                                          prior, strengths, tol)
+    return BradleyTerryFit(bouts.fighters, strengths, to_ratings(strengths), iterations)
+
+
+@profiled('rate.bradley_terry')
+def bradley_terry_replay(bouts, half_life=None, prior=1.0, winner=None, tol=1e-6):
+    # Refit after every card, starting from the previous fit. Each bout's initial ratings come from
+    # the fit on the bouts before its card and the new ratings from the fit including it,
+    # so the initial ratings never see the bout's result
+    w, l, wins, played = incidence(bouts, winner)
+    n = len(bouts.red)
+    starts = card_starts(bouts.day)
+    per_bout = [np.empty(n, dtype=RATING_DTYPE) for _ in range(4)]
+    red_initial, blue_initial, red_new, blue_new = per_bout
+
+    strengths = np.ones(len(bouts.fighters))
+    ratings = to_ratings(strengths)
+    for start, stop in zip(starts[:-1], starts[1:]):
+        red_initial[start:stop] = np.rint(ratings[bouts.red[start:stop]])
+        blue_initial[start:stop] = np.rint(ratings[bouts.blue[start:stop]])
+        mask = np.arange(n) < stop
+        weights = bout_weights(bouts.day, bouts.day[start], half_life, mask)
+        strengths, _ = fit_strengths(w, l, wins, played, weights, prior, strengths, tol)
+        ratings = to_ratings(strengths)
+        red_new[start:stop] = np.rint(ratings[bouts.red[start:stop]])
+        blue_new[start:stop] = np.rint(ratings[bouts.blue[start:stop]])
+    return BradleyTerryReplay(red_initial, blue_initial, red_new, blue_new, ratings)
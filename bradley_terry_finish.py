@@ -0,0 +1,29 @@
+from elo_engine import load_bouts, prepare_bouts, rating_frame, write_rating_frame, current_ratings_frame
+from bradley_terry import bradley_terry_replay, fit
+
+# Days for a bout's weight to halve (None weights every bout the same) and the virtual games per fighter
+half_life = 730
+prior = 1.0
+
+def calculate_bradley_terry(input_file, output_file, current_file=None):
+    # Sort DataFrame by date after parsing dates
+    df = load_bouts(input_file)
+
+    # Refit after every card so each bout is rated only from the bouts before it
+    bouts = prepare_bouts(df)
+    result = bradley_terry_replay(bouts, half_life=half_life, prior=prior)
+
+    # Same layout as the Elo outputs, latest matches first
+    new_df = rating_frame(df, result)
+    write_rating_frame(new_df, output_file)
+    if current_file is not None:
+        current = fit(bouts, half_life=half_life, prior=prior)
+        current_ratings_frame(bouts.fighters, current.ratings.round().astype(int)).to_csv(current_file, index=False)
+    print(f'Bradley-Terry ratings calculated and saved to {output_file}')
+
+if __name__ == "__main__":
+    input_file_path = '/Users/richie/Documents/git_hub/elo_project/ufc/cleaned_ufc_data_with_finish.csv'
+    output_file_path = 'elo_scores_bradley_terry.csv'
+    current_file_path = None  # e.g. 'current_bradley_terry_scores.csv' for a fit on the full history
+
+    calculate_bradley_terry(input_file_path, output_file_path, current_file=current_file_path)
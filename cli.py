@@ -0,0 +1,143 @@
+import argparse
+import os
+import sys
+
+
+'''
+One command line for the whole pipeline:
+
+    python cli.py clean ufc-master.csv cleaned_ufc_data_with_finish.csv
+    python cli.py rate cleaned_ufc_data_with_finish.csv --models simple decay --output-dir ratings
+    python cli.py optimize cleaned_ufc_data_with_finish.csv --strategy tpe --budget 300
+    python cli.py compare ratings/*.csv --output-dir reports
+    python cli.py plot --metrics reports/model_metrics.json --output-dir reports
+
+Only argparse is loaded up front. Every command imports the modules it runs when it
+runs, so the help and a command's argument errors come back at once, and a command
+never pays for the libraries of another (matplotlib is only loaded by plot, sklearn
+only when metrics are computed). The scripts keep working on their own with their
+settings in their __main__ blocks.
+
+benchmarks/cold_start.py times these start-ups in fresh processes against a budget.
+'''
+
+
+def clean(args):
+    from data_cleaner_finish import process_ufc_data
+
+    process_ufc_data(args.input_file, args.output_file, chunksize=args.chunksize)
+
+
+def rate(args):
+    from model_runner import analyze, run_models, write_outputs
+
+    frames, full = run_models(args.input_file, args.models, args.mode, args.workers, args.snapshot)
+    write_outputs(frames, full, args.output_dir)
+    if args.analyze:
+        analyze(frames, args.output_dir)
+
+
+def optimize(args):
+    from parameter_optimizer import optimize
+
+    optimize(args.input_file, strategy=args.strategy, budget=args.budget, workers=args.workers,
+             shard_size=args.shard_size, use_cache=args.cache, show_walk_forward=not args.no_walk_forward,
+             show_intervals=args.intervals, n_resamples=args.resamples, model=args.model)
+
+
+def compare(args):
+    from betting_compare import filter_predictions
+    from comparative_analysis_finish import compute_metrics
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = lambda name: os.path.join(args.output_dir, name)
+    filter_predictions(args.rating_files, path('correct_elo_wrong_odds.csv'), path('correct_odds_wrong_elo.csv'),
+                       path('model_disagreements.csv'))
+    metrics = compute_metrics(args.rating_files, path('model_metrics.json'), refresh=args.refresh)
+    for model, model_metrics in metrics['models'].items():
+        print(f"{model}: AUC {model_metrics['auc']:.3f}, log loss {model_metrics['log_loss']:.4f}, "
+              f"Brier {model_metrics['brier']:.4f} over {model_metrics['bouts']} bouts")
+    if args.backtest:
+        from odds_backtest import odds_backtest
+
+        print(odds_backtest(args.rating_files, path('odds_backtest.csv')).to_string(index=False))
+
+
+def plot(args):
+    from comparative_analysis_finish import (compute_metrics, load_metrics, plot_calibration, plot_combined_accuracy,
+                                             plot_combined_roc)
+
+    # Metrics are computed from the rating files when given, otherwise read from a previous compare
+    if args.rating_files:
+        metrics = compute_metrics(args.rating_files, args.metrics)['models']
+    else:
+        metrics = load_metrics(args.metrics)
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = lambda name: os.path.join(args.output_dir, name)
+    plot_combined_roc(metrics, path('combined_roc_curves.png'))
+    plot_combined_accuracy(metrics, path('combined_accuracy_bars.png'))
+    plot_calibration(metrics, path('calibration_curves.png'))
+    print(f'Plots of {len(metrics)} models written to {args.output_dir}')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Clean the UFC data, rate fighters and compare the models')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('clean', help='clean the raw UFC data')
+    command.add_argument('input_file')
+    command.add_argument('output_file', help='CSV, or a .cols directory for the column store')
+    command.add_argument('--chunksize', type=int, default=100_000, help='raw rows cleaned at a time')
+    command.set_defaults(run=clean)
+
+    command = commands.add_parser('rate', help='rate every bout with one or more models')
+    command.add_argument('input_file')
+    command.add_argument('--models', nargs='+', metavar='MODEL',
+                         help='simple, k_factor, decay, market, glicko and/or bradley_terry, all by default')
+    command.add_argument('--mode', choices=['fused', 'pool'], default='fused')
+    command.add_argument('--workers', type=int, help='processes in pool mode, one per model by default')
+    command.add_argument('--snapshot', help='state file so later fused runs only rate new bouts')
+    command.add_argument('--output-dir', default='.')
+    command.add_argument('--analyze', action='store_true', help='also write the prediction reports and model metrics')
+    command.set_defaults(run=rate)
+
+    command = commands.add_parser('optimize', help='search the rating parameters')
+    command.add_argument('input_file')
+    command.add_argument('--strategy', choices=['grid', 'random', 'coordinate', 'halving', 'tpe'], default='grid')
+    command.add_argument('--budget', type=int, default=300, help='evaluations a search strategy may spend')
+    command.add_argument('--model', choices=['elo', 'glicko'], default='elo')
+    command.add_argument('--workers', type=int, default=os.cpu_count(), help='processes for the grid sweep')
+    command.add_argument('--shard-size', type=int, default=1024)
+    command.add_argument('--cache', action='store_true', help='resume search candidates from cached replay prefixes')
+    command.add_argument('--intervals', type=int, default=20, help='best grid points to bootstrap, 0 to skip')
+    command.add_argument('--resamples', type=int, default=10000)
+    command.add_argument('--no-walk-forward', action='store_true', help='skip the season by season report')
+    command.set_defaults(run=optimize)
+
+    command = commands.add_parser('compare', help='prediction reports and metrics of rating outputs')
+    command.add_argument('rating_files', nargs='+')
+    command.add_argument('--output-dir', default='.')
+    command.add_argument('--refresh', action='store_true', help='recompute cached metrics')
+    command.add_argument('--backtest', action='store_true', help='also backtest the models against the odds')
+    command.set_defaults(run=compare)
+
+    command = commands.add_parser('plot', help='ROC, accuracy and calibration plots')
+    command.add_argument('rating_files', nargs='*', help='rating outputs, or none to plot saved metrics')
+    command.add_argument('--metrics', default='model_metrics.json')
+    command.add_argument('--output-dir', default='.')
+    command.set_defaults(run=plot)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.run(args)
+    except (FileNotFoundError, ValueError) as e:
+        print(f'{args.command}: {e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+'''
+Binary column store for bout histories and rating outputs.
+
+A store is a directory ending in .cols holding one .npy file per column plus a
+columns.json index. Text columns are stored as small integer codes into a shared
+dictionary, dates as int32 day numbers and ratings as int32, and every column is
+memory mapped when the store is read back. Any other path is read and written as CSV,
+so loaders can take either.
+
+write_table_chunks builds the same store from a DataFrame that arrives in chunks, e.g.
+from pd.read_csv(chunksize=...), holding one chunk in memory at a time. Each chunk's
+columns are spilled to temporary files as it comes and copied into the final columns
+at the end, so memory stays flat however long the table is.
+'''
+
+
+STORE_SUFFIX = '.cols'
+
+# Columns that share one dictionary, so their codes mean the same thing across columns
+CATEGORY_GROUPS = {
+    'fighters': ['R_fighter', 'B_fighter', 'red fighter', 'blue fighter'],
+    'corners': ['Winner', 'Favorite', 'winner', 'favorite'],
+}
+
+
+def is_column_store(path):
+    return str(path).rstrip('/').endswith(STORE_SUFFIX)
+
+
+def modified_time(path):
+    # Last modification of a table. A store's files can be rewritten in place without
+    # touching the directory, so it is the newest of its files
+    if not is_column_store(path):
+        return os.path.getmtime(path)
+    return max(entry.stat().st_mtime for entry in os.scandir(path) if entry.is_file())
+
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _category_group(column):
+    return next((group for group, columns in CATEGORY_GROUPS.items() if column in columns), column)
+
+
+def _is_text(series):
+    return not pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_datetime64_any_dtype(series)
+
+
+def write_table(df, path, append=False):
+    # With append the rows of df go in front of the rows already in the store,
+    # matching the rating outputs which list the latest bouts first
+    if not is_column_store(path):
+        df.to_csv(path, index=False)
+        return
+    if append and os.path.exists(path):
+        df = pd.concat([df, read_table(path, mmap=False)], ignore_index=True)
+    os.makedirs(path, exist_ok=True)
+
+    text_columns = [column for column in df.columns if _is_text(df[column])]
+    groups = {}
+    for column in text_columns:
+        groups.setdefault(_category_group(column), []).append(column)
+    categories = {}
+    for group, columns in groups.items():
+        values = pd.concat([df[column].astype(object) for column in columns])
+        categories[group] = pd.unique(values.dropna())
+
+    meta = {'n_rows': len(df), 'columns': [], 'categories': {}}
+    for i, (group, values) in enumerate(categories.items()):
+        np.save(os.path.join(path, f'categories{i}.npy'), np.asarray(values, dtype=str))
+        meta['categories'][group] = f'categories{i}.npy'
+
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        if column in text_columns:
+            group = _category_group(column)
+            kind = 'category'
+            values = pd.Index(categories[group]).get_indexer(series.astype(object)).astype(_code_dtype(len(categories[group])))
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            group = None
+            kind = 'date'
+            values = series.to_numpy().astype('datetime64[D]').astype(np.int32)
+        else:
+            group = None
+            kind = 'value'
+            values = series.to_numpy()
+            if pd.api.types.is_integer_dtype(values) and len(values) and \
+                    np.iinfo(np.int32).min <= values.min() and values.max() <= np.iinfo(np.int32).max:
+                values = values.astype(np.int32)
+        np.save(os.path.join(path, f'column{i}.npy'), values)
+        meta['columns'].append({'name': column, 'file': f'column{i}.npy', 'kind': kind, 'categories': group})
+
+    with open(os.path.join(path, 'columns.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+
+def write_table_chunks(chunks, path, reverse=False):
+    # write_table for an iterable of DataFrames with the same columns, in order or, with
+    # reverse, last chunk first. The result is the same store as writing them concatenated.
+    # Returns the number of rows written, with no chunks at all nothing is written
+    path = str(path).rstrip('/')
+    parts_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        columns, kinds, lengths = None, None, []
+        seen = {}  # Spill code of every text value per category group, in order of first appearance
+        for n, chunk in enumerate(chunks):
+            if columns is None:
+                columns = list(chunk.columns)
+                kinds = ['category' if _is_text(chunk[column]) else
+                         'date' if pd.api.types.is_datetime64_any_dtype(chunk[column]) else 'value' for column in columns]
+            for i, column in enumerate(columns):
+                series = chunk[column]
+                if kinds[i] == 'category':
+                    codes = seen.setdefault(_category_group(column), {})
+                    for value in pd.unique(series.astype(object).dropna()):
+                        codes.setdefault(value, len(codes))
+                    values = pd.Index(list(codes), dtype=object).get_indexer(series.astype(object)).astype(np.int32)
+                elif kinds[i] == 'date':
+                    values = series.to_numpy().astype('datetime64[D]').astype(np.int32)
+                else:
+                    values = series.to_numpy()
+                np.save(os.path.join(parts_dir, f'{n}_{i}.npy'), values)
+            lengths.append(len(chunk))
+        if columns is None:
+            return 0
+
+        order = list(range(len(lengths)))[::-1] if reverse else list(range(len(lengths)))
+        part = lambda n, i: np.load(os.path.join(parts_dir, f'{n}_{i}.npy'))
+        n_rows = sum(lengths)
+        os.makedirs(path, exist_ok=True)
+        meta = {'n_rows': n_rows, 'columns': [], 'categories': {}}
+
+        # Categories in order of first appearance over the group's columns in final row order,
+        # like write_table, and the map from spill codes to their final codes
+        groups = {}
+        for i, column in enumerate(columns):
+            if kinds[i] == 'category':
+                groups.setdefault(_category_group(column), []).append(i)
+        remaps = {}
+        for g, (group, indexes) in enumerate(groups.items()):
+            first = [np.empty(0, dtype=np.int32)]
+            for i in indexes:
+                for n in order:
+                    codes = part(n, i)
+                    first.append(pd.unique(codes[codes >= 0]))
+            first = pd.unique(np.concatenate(first))
+            remap = np.full(len(seen.get(group, ())), -1, dtype=np.int64)
+            remap[first] = np.arange(len(first))
+            remaps[group] = remap
+            values = np.asarray(list(seen.get(group, ())), dtype=object)[first]
+            np.save(os.path.join(path, f'categories{g}.npy'), np.asarray(values, dtype=str))
+            meta['categories'][group] = f'categories{g}.npy'
+
+        for i, column in enumerate(columns):
+            # Type of the whole column, then the parts are copied into it one at a time
+            group = _category_group(column) if kinds[i] == 'category' else None
+            if kinds[i] == 'category':
+                dtype = _code_dtype(len(remaps[group]))
+            elif kinds[i] == 'date':
+                dtype = np.int32
+            else:
+                dtype = np.result_type(*[np.load(os.path.join(parts_dir, f'{n}_{i}.npy'), mmap_mode='r').dtype
+                                         for n in order])
+                if np.issubdtype(dtype, np.integer) and n_rows:
+                    low = min(part(n, i).min() for n in order if lengths[n])
+                    high = max(part(n, i).max() for n in order if lengths[n])
+                    if np.iinfo(np.int32).min <= low and high <= np.iinfo(np.int32).max:
+                        dtype = np.int32
+            file = os.path.join(path, f'column{i}.npy')
+            if n_rows == 0:
+                np.save(file, np.empty(0, dtype=dtype))
+            else:
+                out = np.lib.format.open_memmap(file, mode='w+', dtype=dtype, shape=(n_rows,))
+                start = 0
+                for n in order:
+                    values = part(n, i)
+                    if kinds[i] == 'category':
+                        values = np.where(values >= 0, remaps[group][np.maximum(values, 0)], -1)
+                    out[start:start + lengths[n]] = values
+                    start += lengths[n]
+                out.flush()
+                del out
+            meta['columns'].append({'name': column, 'file': f'column{i}.npy', 'kind': kinds[i], 'categories': group})
+
+        with open(os.path.join(path, 'columns.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        return n_rows
+    finally:
+        shutil.rmtree(parts_dir)
+
+
+def read_table(path, mmap=True, columns=None):
+    # Load a CSV or a column store as a DataFrame, text columns come back as categoricals
+    if not is_column_store(path):
+        return pd.read_csv(path, usecols=columns)
+    with open(os.path.join(path, 'columns.json')) as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap and meta['n_rows'] else None
+
+    categories = {}
+    data = {}
+    for column in meta['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        values = np.load(os.path.join(path, column['file']), mmap_mode=mmap_mode)
+        if column['kind'] == 'category':
+            group = column['categories']
+            if group not in categories:
+                categories[group] = pd.Index(np.load(os.path.join(path, meta['categories'][group])).astype(object))
+            data[column['name']] = pd.Categorical.from_codes(values, categories=categories[group])
+        elif column['kind'] == 'date':
+            data[column['name']] = values.astype('datetime64[D]').astype('datetime64[s]')
+        else:
+            data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
@@ -1,42 +1,108 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.metrics import accuracy_score, roc_curve, auc
+import json
+import os
 import numpy as np
+from columnar_store import modified_time, read_table
+from prediction_report import model_name
+from walk_forward import EPSILON, expected_score
 
-def calculate_accuracy_by_elo_diff(df):
-    elo_diff_categories = [(0, 50), (50, 100), (100, 150), (150, 200), (200, 250), (250, 300), (300, 350), (350, 400), (400, 450), (450, 500)]
-    accuracies = []
+# Bands of |elo_diff| for the accuracy bars, 0-50 up to 450-500
+ELO_DIFF_BINS = np.arange(0, 550, 50)
+CATEGORY_LABELS = [f'{low}-{high}' for low, high in zip(ELO_DIFF_BINS[:-1], ELO_DIFF_BINS[1:])]
+
+# Bins of the red corner's expected score for the calibration curves
+CALIBRATION_BINS = np.linspace(0, 1, 11)
 
-    for lower_bound, upper_bound in elo_diff_categories:
-        filtered_df = df[abs(df['elo_diff']).between(lower_bound, upper_bound)]
-        if not filtered_df.empty:
-            accuracy = accuracy_score(filtered_df['winner'], filtered_df['predicted_outcome']) * 100
-        else:
-            accuracy = 0  # Changed from None to 0 for plotting
-        accuracies.append(accuracy)
+def calculate_accuracy_by_elo_diff(df):
+    # Accuracy within each band of |elo_diff|, binned in one pass. A bout on a band edge
+    # counts in the band above it, except 500 which closes the last band
+    elo_diff = abs(df['elo_diff'].to_numpy())
+    in_range = elo_diff <= ELO_DIFF_BINS[-1]
+    band = np.digitize(elo_diff[in_range], ELO_DIFF_BINS[1:-1])
+    correct = (df['predicted_outcome'] == df['winner']).to_numpy()[in_range]
 
-    return accuracies
+    bouts = np.bincount(band, minlength=len(CATEGORY_LABELS))
+    hits = np.bincount(band, weights=correct, minlength=len(CATEGORY_LABELS))
+    # Empty bands are 0 for plotting
+    return (np.divide(hits, bouts, out=np.zeros(len(bouts)), where=bouts > 0) * 100).tolist()
 
 def prepare_data_for_plots(csv_file):
-    df = pd.read_csv(csv_file)
+    # A rating output file, or a rating frame already in memory
+    df = read_table(csv_file) if isinstance(csv_file, (str, os.PathLike)) else csv_file.copy()
     if 'elo_diff' not in df.columns:
         df['elo_diff'] = df['red fighter initial elo'] - df['blue fighter initial elo']
-    df['predicted_outcome'] = df['elo_diff'].apply(lambda diff: 'Red' if diff >= 0 else 'Blue')
-    df['winner_numeric'] = df['winner'].apply(lambda x: 1 if x == 'Red' else 0)
-    df['pred_prob_red'] = df['elo_diff'].apply(lambda x: 1 if x >= 0 else 0)
-    
+    df['predicted_outcome'] = np.where(df['elo_diff'] >= 0, 'Red', 'Blue')
+    df['winner'] = df['winner'].astype(object)
+    df['winner_numeric'] = (df['winner'] == 'Red').astype(int)
+    # Logistic expected score of the red corner from the ratings going into the bout
+    df['pred_prob_red'] = expected_score(df['red fighter initial elo'].to_numpy(), df['blue fighter initial elo'].to_numpy())
+
     return df
 
-def plot_combined_roc(csv_files):
-    plt.figure(figsize=(8, 6))
+def calculate_model_metrics(df):
+    # Probability metrics cover bouts with a winner, the accuracy bars every bout like before
+    from sklearn.metrics import roc_curve, auc  # Slow to import, cached metrics skip it
+
+    decided = df['winner'].isin(['Red', 'Blue']).to_numpy()
+    true_values = df['winner_numeric'].to_numpy()[decided]
+    predicted_probs = df['pred_prob_red'].to_numpy()[decided]
+
+    fpr, tpr, _ = roc_curve(true_values, predicted_probs)
+    clipped = np.clip(predicted_probs, EPSILON, 1 - EPSILON)
+    log_loss = -np.mean(np.where(true_values == 1, np.log(clipped), np.log1p(-clipped)))
+
+    bins = np.digitize(predicted_probs, CALIBRATION_BINS[1:-1])
+    bouts = np.bincount(bins, minlength=len(CALIBRATION_BINS) - 1)
+    predicted = np.bincount(bins, weights=predicted_probs, minlength=len(bouts))
+    observed = np.bincount(bins, weights=true_values, minlength=len(bouts))
+    filled = bouts > 0
+
+    return {
+        'bouts': int(decided.sum()),
+        'roc': {'fpr': fpr.tolist(), 'tpr': tpr.tolist()},
+        'auc': auc(fpr, tpr),
+        'log_loss': log_loss,
+        'brier': float(np.mean((predicted_probs - true_values) ** 2)),
+        'calibration': {
+            'predicted': (predicted[filled] / bouts[filled]).tolist(),
+            'observed': (observed[filled] / bouts[filled]).tolist(),
+            'bouts': bouts[filled].tolist(),
+        },
+        'accuracy_by_elo_diff': calculate_accuracy_by_elo_diff(df),
+    }
+
+def compute_metrics(csv_files, metrics_file, refresh=False):
+    # Load each model output once and cache its metrics. The cache is reused while it covers
+    # the same files and is newer than all of them
+    if not refresh and os.path.exists(metrics_file):
+        with open(metrics_file) as f:
+            cached = json.load(f)
+        fresh = all(modified_time(csv_file) <= os.path.getmtime(metrics_file) for csv_file in csv_files)
+        if fresh and cached.get('files') == list(csv_files):
+            return cached
+
+    metrics = {'files': list(csv_files), 'models': {}}
     for csv_file in csv_files:
-        df = prepare_data_for_plots(csv_file)
-        model_name = csv_file.split('/')[-1].replace('.csv', '')
-        true_values = df['winner_numeric'].values
-        predicted_probs = df['pred_prob_red'].values
-        fpr, tpr, _ = roc_curve(true_values, predicted_probs)
-        roc_auc = auc(fpr, tpr)
-        plt.plot(fpr, tpr, label=f'{model_name} (AUC = {roc_auc:.2f})')
+        metrics['models'][model_name(csv_file)] = calculate_model_metrics(prepare_data_for_plots(csv_file))
+    with open(metrics_file, 'w') as f:
+        json.dump(metrics, f)
+    print(f"Model metrics written to {metrics_file}")
+    return metrics
+
+def frame_metrics(frames):
+    # Metrics of rating frames already in memory (e.g. from model_runner), keyed by model name
+    return {model: calculate_model_metrics(prepare_data_for_plots(df)) for model, df in frames.items()}
+
+def load_metrics(metrics_file):
+    with open(metrics_file) as f:
+        return json.load(f)['models']
+
+def plot_combined_roc(metrics, output_file='combined_roc_curves.png'):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 6))
+    for model, model_metrics in metrics.items():
+        roc = model_metrics['roc']
+        plt.plot(roc['fpr'], roc['tpr'], label=f"{model} (AUC = {model_metrics['auc']:.2f})")
 
     plt.plot([0, 1], [0, 1], 'k--')
     plt.xlim([0.0, 1.0])
@@ -46,38 +112,61 @@ def plot_combined_roc(csv_files):
     plt.title('Combined ROC Curves')
     plt.legend(loc="lower right")
     plt.tight_layout()
-    plt.savefig('combined_roc_curves.png')
+    plt.savefig(output_file)
     plt.close()
 
-def plot_combined_accuracy(csv_files):
-    category_labels = ['0-50', '50-100', '100-150', '150-200', '200-250', '250-300', '300-350', '350-400', '400-450', '450-500']
-    x = np.arange(len(category_labels))  # the label locations
+def plot_combined_accuracy(metrics, output_file='combined_accuracy_bars.png'):
+    import matplotlib.pyplot as plt
+
+    x = np.arange(len(CATEGORY_LABELS))  # the label locations
     width = 0.2  # the width of the bars
 
     fig, ax = plt.subplots(figsize=(14, 8))
-    for i, csv_file in enumerate(csv_files):
-        df = prepare_data_for_plots(csv_file)
-        accuracies = calculate_accuracy_by_elo_diff(df)
-        model_name = csv_file.split('/')[-1].replace('.csv', '')
-        rects = ax.bar(x + width*i, accuracies, width, label=model_name)
+    for i, (model, model_metrics) in enumerate(metrics.items()):
+        rects = ax.bar(x + width*i, model_metrics['accuracy_by_elo_diff'], width, label=model)
 
     ax.set_xlabel('Elo Difference Categories')
     ax.set_ylabel('Accuracy (%)')
     ax.set_title('Accuracy by Elo Difference Across Models')
-    ax.set_xticks(x + width / len(csv_files))
-    ax.set_xticklabels(category_labels)
+    ax.set_xticks(x + width / len(metrics))
+    ax.set_xticklabels(CATEGORY_LABELS)
     ax.legend()
     ax.axhline(50, color='gray', linestyle='--')
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig('combined_accuracy_bars.png')
+    plt.savefig(output_file)
+    plt.close()
+
+def plot_calibration(metrics, output_file='calibration_curves.png'):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 6))
+    for model, model_metrics in metrics.items():
+        calibration = model_metrics['calibration']
+        plt.plot(calibration['predicted'], calibration['observed'], marker='o',
+                 label=f"{model} (log loss = {model_metrics['log_loss']:.3f})")
+
+    plt.plot([0, 1], [0, 1], 'k--')
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.0])
+    plt.xlabel('Expected Score of Red')
+    plt.ylabel('Observed Red Win Rate')
+    plt.title('Calibration Curves')
+    plt.legend(loc="upper left")
+    plt.tight_layout()
+    plt.savefig(output_file)
     plt.close()
 
-csv_files = [
-    '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_decay.csv',
-    '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_k.csv',
-    '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_simple.csv'
-]
+if __name__ == "__main__":
+    csv_files = [
+        '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_decay.csv',
+        '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_k.csv',
+        '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_simple.csv'
+    ]
+    metrics_file = 'model_metrics.json'
 
-plot_combined_roc(csv_files)
-plot_combined_accuracy(csv_files)
+    compute_metrics(csv_files, metrics_file)
+    metrics = load_metrics(metrics_file)
+    plot_combined_roc(metrics)
+    plot_combined_accuracy(metrics)
+    plot_calibration(metrics)
@@ -1,59 +1,104 @@
+import os
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
+from columnar_store import is_column_store, write_table, write_table_chunks
+from date_ingest import parse_dates
+from instrumentation import stage
+from market_odds import devig
 
-def process_ufc_data(input_file, output_file):
-    try:
-        # Load the data
-        df = pd.read_csv(input_file)
+# Columns read from the raw feed, everything else in the file is skipped while parsing
+RAW_COLUMNS = ['R_fighter', 'B_fighter', 'date', 'Winner', 'R_odds', 'B_odds', 'finish']
 
-        # Select the desired columns and add a column for the betting favorite, and make a copy to avoid SettingWithCopyWarning
-        selected_columns = df[['R_fighter', 'B_fighter', 'date', 'Winner', 'R_odds', 'B_odds', 'finish', 'finish_details']].copy()
+# Columns of the cleaned output, the moneylines kept as they are next to their vig-free probabilities
+CLEANED_COLUMNS = ['R_fighter', 'B_fighter', 'date', 'Winner', 'win_type', 'Favorite', 'R_odds', 'B_odds', 'R_prob', 'B_prob']
 
-        # Function to determine the win type based on the 'finish' column
-        def determine_win_type(row):
-            if row['finish'] == 'SUB':
-                return 'submission'
-            elif row['finish'] == 'KO/TKO':
-                return 'knockout'
-            elif row['finish'] in ['S-DEC', 'M-DEC']:  
-                return 'split'
-            elif row['finish'] == 'U-DEC':
-                return 'unanimous'
-            elif row['finish'] == 'DQ':
-                return 'dq'
-            elif pd.isna(row['finish']):
-                return 'unknown'  # For NaN values
-            else:
-                return 'other'  # Covers 'Overturned' and any other cases not explicitly handled
+# Win type for each code in the 'finish' column, missing codes are 'unknown' and
+# anything else (e.g. 'Overturned') is 'other'
+WIN_TYPES = {
+    'SUB': 'submission',
+    'KO/TKO': 'knockout',
+    'S-DEC': 'split',
+    'M-DEC': 'split',
+    'U-DEC': 'unanimous',
+    'DQ': 'dq',
+}
 
-        # Apply the function to each row to determine win type
-        selected_columns['win_type'] = selected_columns.apply(determine_win_type, axis=1)
+def clean_chunk(chunk):
+    # Determine the win type based on the 'finish' column
+    finish = chunk['finish']
+    win_type = np.select(
+        [finish.isna().to_numpy(), finish.isin(list(WIN_TYPES)).to_numpy()],
+        ['unknown', finish.map(WIN_TYPES).to_numpy(dtype=object)],
+        'other',
+    )
 
-        # Determine the betting favorite
-        def determine_favorite(row):
-            if row['R_odds'] < row['B_odds']:
-                return 'Red'
-            elif row['R_odds'] > row['B_odds']:
-                return 'Blue'
-            else:  # Handle potential edge case where odds are equal or not available
-                return 'Even'
+    # Determine the betting favorite, equal or missing odds are 'Even'
+    favorite = np.select(
+        [(chunk['R_odds'] < chunk['B_odds']).to_numpy(), (chunk['R_odds'] > chunk['B_odds']).to_numpy()],
+        ['Red', 'Blue'],
+        'Even',
+    )
 
-        # Apply the function to each row to determine the favorite
-        selected_columns['Favorite'] = selected_columns.apply(determine_favorite, axis=1)
+    # Market probabilities with the bookmaker's margin taken out, NaN without a valid line
+    red_odds = chunk['R_odds'].to_numpy(dtype=np.float64)
+    blue_odds = chunk['B_odds'].to_numpy(dtype=np.float64)
+    red_prob, blue_prob, _ = devig(red_odds, blue_odds)
 
-        # Drop the odds and finish columns as they are no longer needed
-        final_df = selected_columns.drop(columns=['R_odds', 'B_odds', 'finish', 'finish_details'])
+    return pd.DataFrame({
+        'R_fighter': chunk['R_fighter'].to_numpy(),
+        'B_fighter': chunk['B_fighter'].to_numpy(),
+        'date': chunk['date'].to_numpy(),
+        'Winner': chunk['Winner'].to_numpy(),
+        'win_type': win_type,
+        'Favorite': favorite,
+        'R_odds': red_odds,
+        'B_odds': blue_odds,
+        'R_prob': red_prob,
+        'B_prob': blue_prob,
+    }, columns=CLEANED_COLUMNS)
 
-        # Reorder columns to place 'win_type' before 'Favorite'
-        final_df = final_df[['R_fighter', 'B_fighter', 'date', 'Winner', 'win_type', 'Favorite']]
+def process_ufc_data(input_file, output_file, chunksize=100_000):
+    # Stream the raw feed in fixed-size chunks restricted to the columns we use
+    chunks = pd.read_csv(input_file, usecols=RAW_COLUMNS, chunksize=chunksize)
 
-        # Reverse the DataFrame
-        reversed_df = final_df.iloc[::-1]
+    # The output lists the raw rows in reverse, so each cleaned chunk is reversed and the
+    # chunks are written last to first
+    with stage('clean') as total:
+        if is_column_store(output_file):
+            # Each cleaned chunk is spilled to disk as it comes, like the CSV parts below,
+            # and the store is assembled from them last to first
+            def cleaned_chunks():
+                for chunk in chunks:
+                    with stage('clean.chunk', rows=len(chunk)):
+                        cleaned = clean_chunk(chunk).iloc[::-1]
+                        cleaned = cleaned.assign(date=parse_dates(cleaned['date']))
+                    total.rows += len(chunk)
+                    yield cleaned
 
-        # Save the new DataFrame to a new CSV file
-        reversed_df.to_csv(output_file, index=False)
-        print(f"File saved successfully as {output_file}")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+            with stage('clean.write'):
+                if not write_table_chunks(cleaned_chunks(), output_file, reverse=True):
+                    write_table(pd.DataFrame(columns=CLEANED_COLUMNS), output_file)
+        else:
+            # Keep memory flat by spilling each cleaned chunk to a temporary part file
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_file))) as parts_dir:
+                parts = []
+                for i, chunk in enumerate(chunks):
+                    with stage('clean.chunk', rows=len(chunk)):
+                        cleaned = clean_chunk(chunk).iloc[::-1]
+                    with stage('clean.write', rows=len(cleaned)):
+                        part = os.path.join(parts_dir, f'part{i}.csv')
+                        cleaned.to_csv(part, index=False, header=False)
+                    parts.append(part)
+                    total.rows += len(chunk)
+
+                with stage('clean.write'), open(output_file, 'w', newline='') as out:
+                    out.write(','.join(CLEANED_COLUMNS) + '\n')
+                    for part in reversed(parts):
+                        with open(part, newline='') as f:
+                            shutil.copyfileobj(f, out)
+    print(f"File saved successfully as {output_file}")
 
 if __name__ == "__main__":
     # Set the path to your input file
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+
+
+'''
+Shared date parsing for every stage of the pipeline.
+
+parse_dates parses a whole column at once: each distinct string is parsed a single
+time (a card puts many bouts on one date), the formats are tried in order over all
+still-unparsed values together, and strings seen by earlier calls come from a cache.
+day_numbers turns parsed dates into int32 days since 1970-01-01, which the decay
+math subtracts directly.
+'''
+
+
+DATE_FORMATS = ('%m/%d/%Y', '%Y-%m-%d')
+
+_EPOCH = date(1970, 1, 1)
+
+# Parsed value of every date string seen so far, capped so long-running processes stay bounded
+_date_cache = {}
+_DATE_CACHE_SIZE = 1_000_000
+
+
+def parse_date(date_str):
+    if not isinstance(date_str, str):
+        return date_str  # If it's already a datetime object, just return it as is
+
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    raise ValueError('No valid date format found for ' + str(date_str))
+
+
+def parse_dates(values):
+    # Vectorized parse_date for a column, returns a datetime64 Series.
+    # Columns that already hold dates are returned as they are
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    codes, uniques = pd.factorize(series.astype(object))
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    parsed = pd.Series(uniques.map(_date_cache), dtype='datetime64[ns]')
+
+    is_text = uniques.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    missing = parsed.isna().to_numpy() & is_text
+    for fmt in DATE_FORMATS:
+        if not missing.any():
+            break
+        attempt = pd.to_datetime(uniques[missing], format=fmt, errors='coerce')
+        parsed[missing] = attempt
+        missing = parsed.isna().to_numpy() & is_text
+    if missing.any():
+        raise ValueError('No valid date format found for ' + str(uniques[missing].iloc[0]))
+
+    # Values that were already datetimes pass through like parse_date does
+    if not is_text.all():
+        parsed[~is_text] = pd.to_datetime(uniques[~is_text])
+
+    if len(_date_cache) > _DATE_CACHE_SIZE:
+        _date_cache.clear()
+    _date_cache.update(zip(uniques[is_text], parsed[is_text]))
+
+    result = parsed.to_numpy()[codes]
+    result[codes < 0] = np.datetime64('NaT')
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def day_numbers(dates):
+    # Day numbers so inactivity is a plain integer subtraction
+    return parse_dates(dates).to_numpy().astype('datetime64[D]').astype(np.int32)
+
+
+def day_number(value):
+    # day_numbers for a single date string, date or datetime
+    if isinstance(value, str):
+        value = parse_date(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - _EPOCH).days
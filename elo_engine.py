@@ -0,0 +1,656 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+from columnar_store import is_column_store, read_table, write_table
+from date_ingest import day_numbers, parse_dates
+from instrumentation import stage
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the replay loop also runs as plain Python
+    njit = None
+
+
+# Winner codes used by the replay loop
+RED = 0
+BLUE = 1
+NO_WINNER = 2
+
+DEFAULT_ELO = 1000
+
+# Bout history with fighter names interned to integer ids and every column
+# pre-extracted into a flat array, in the order the bouts are replayed
+Bouts = namedtuple('Bouts', ['fighters', 'red', 'blue', 'winner', 'win_code', 'win_types', 'day'])
+
+# Per-bout ratings plus the engine state (indexed by fighter id) after the replay
+Replay = namedtuple('Replay', ['red_initial', 'blue_initial', 'red_new', 'blue_new', 'ratings', 'fight_counts', 'last_day'])
+
+# Engine state indexed by fighter id, enough to resume a replay part way through
+EngineState = namedtuple('EngineState', ['ratings', 'fight_counts', 'last_day'])
+
+# Compact types of the state and the per-bout ratings. Ratings stay within a few thousand
+# points of DEFAULT_ELO, no fighter gets near 65535 bouts and days are day_numbers
+RATING_DTYPE = np.int32
+COUNT_DTYPE = np.uint16
+DAY_DTYPE = np.int32
+
+
+def load_bouts(input_file):
+    # Read the cleaned bout history (CSV or column store), parse dates and sort the way every script always has.
+    # A DataFrame already read is taken as well, and copied so the caller's frame is left as it was
+    with stage('load.read') as read:
+        df = input_file.copy() if isinstance(input_file, pd.DataFrame) else read_table(input_file)
+        read.rows = len(df)
+    with stage('load.parse_dates', rows=len(df)):
+        df['date'] = parse_dates(df['date'])
+    with stage('load.sort', rows=len(df)):
+        # Stable, so bouts on the same date keep the file's order and a snapshot run orders
+        # them like a full recompute
+        return df.sort_values(by='date', kind='stable')
+
+
+def prepare_bouts(df, fighters=None):
+    # Intern fighter names once so the replay only deals with integer ids.
+    # Names already in fighters keep their ids, new names are added after them
+    n = len(df)
+    names = np.concatenate([df['R_fighter'].to_numpy(dtype=object), df['B_fighter'].to_numpy(dtype=object)])
+    if fighters is None:
+        codes, fighters = pd.factorize(names)
+    else:
+        known = pd.Index(fighters)
+        codes = known.get_indexer(names)
+        new = codes < 0
+        new_codes, new_names = pd.factorize(names[new])
+        codes[new] = len(known) + new_codes
+        fighters = np.concatenate([np.asarray(fighters, dtype=object), np.asarray(new_names, dtype=object)])
+    codes = codes.astype(np.int32)
+
+    winner = np.full(n, NO_WINNER, dtype=np.int8)
+    winner[(df['Winner'] == 'Red').to_numpy()] = RED
+    winner[(df['Winner'] == 'Blue').to_numpy()] = BLUE
+
+    win_code, win_types = pd.factorize(df['win_type'], use_na_sentinel=False)
+
+    day = day_numbers(df['date'])
+
+    return Bouts(
+        fighters=np.asarray(fighters, dtype=object),
+        red=codes[:n],
+        blue=codes[n:],
+        winner=winner,
+        win_code=win_code.astype(np.int8),
+        win_types=list(win_types),
+        day=day,
+    )
+
+
+def multiplier_table(bouts, multiplier_dict):
+    # Resolve the win type multipliers once per win code instead of once per bout.
+    # Scalar values give one row, arrays of parameter sets give one row per set
+    columns = [np.asarray(multiplier_dict.get(win_type, 1.0), dtype=np.float64) for win_type in bouts.win_types]
+    if not columns:
+        return np.zeros(0)
+    return np.stack(np.broadcast_arrays(*columns), axis=-1)
+
+
+def head_bouts(bouts, n, history=None):
+    # The first n bouts, with their slice of fight_history when one is given
+    head = bouts._replace(red=bouts.red[:n], blue=bouts.blue[:n], winner=bouts.winner[:n],
+                          win_code=bouts.win_code[:n], day=bouts.day[:n])
+    if history is None:
+        return head
+    return head, tuple(column[:n] for column in history)
+
+
+def fight_history(bouts):
+    # Fight count and days since the previous fight for both corners before every bout.
+    # Neither depends on the rating parameters, so sweeps compute them once
+    n = len(bouts.red)
+    fighter = np.concatenate([bouts.red, bouts.blue])
+    bout = np.concatenate([np.arange(n), np.arange(n)])
+    order = np.lexsort((bout, fighter))
+
+    position = np.arange(2 * n)
+    first = np.ones(2 * n, dtype=bool)
+    first[1:] = fighter[order][1:] != fighter[order][:-1]
+    counts = position - np.maximum.accumulate(np.where(first, position, 0))
+
+    day = bouts.day[bout[order]]
+    inactive_days = np.zeros(2 * n, dtype=np.int32)
+    inactive_days[1:] = day[1:] - day[:-1]
+    inactive_days[first] = 0
+
+    fights = np.empty(2 * n, dtype=np.int64)
+    fights[order] = counts
+    days = np.empty(2 * n, dtype=np.int32)
+    days[order] = inactive_days
+    return fights[:n], fights[n:], days[:n], days[n:]
+
+
+# Ratings are whole points, so the expected score 1 / (1 + 10 ** (diff / 400)) of a fighter
+# rated diff points below the opponent is looked up for every difference within MAX_RATING_DIFF
+# instead of calling pow twice per bout. The table is filled with the scalar pow the compiled
+# loops used, so every entry is bit for bit what the formula gives
+MAX_RATING_DIFF = 4000
+EXPECTED_SCORE_TABLE = np.array([1 / (1 + 10 ** (diff / 400)) for diff in range(-MAX_RATING_DIFF, MAX_RATING_DIFF + 1)])
+
+
+def _expected_score(diff):
+    # Expected score for a whole (int or integral float) rating difference, opponent minus own
+    if -MAX_RATING_DIFF <= diff <= MAX_RATING_DIFF:
+        return EXPECTED_SCORE_TABLE[int(diff) + MAX_RATING_DIFF]
+    return 1 / (1 + 10 ** (diff / 400))
+
+
+if njit is not None:
+    _expected_score = njit(cache=True, nogil=True)(_expected_score)
+
+
+def expected_scores(diff):
+    # Vectorized _expected_score for an array of whole rating differences, opponent minus own
+    diff = np.asarray(diff)
+    flat = diff.ravel()
+    index = np.clip(flat, -MAX_RATING_DIFF, MAX_RATING_DIFF).astype(np.int64) + MAX_RATING_DIFF
+    scores = EXPECTED_SCORE_TABLE[index]
+    outside = np.flatnonzero(np.abs(flat) > MAX_RATING_DIFF)
+    if len(outside):
+        scores[outside] = [1 / (1 + 10 ** (d / 400)) for d in flat[outside].tolist()]
+    return scores.reshape(diff.shape)
+
+
+def _replay_loop(red, blue, winner, win_code, day, multipliers, k_table,
+                 use_decay, decay_rates, decay_caps, fight_offsets, market_weights, market,
+                 ratings, fight_counts, last_day,
+                 red_initial, blue_initial, red_new, blue_new):
+    # Every column of ratings and of the per-bout outputs is one model, with its row of
+    # multipliers and k_table and its entry of the other parameters. The models rate the
+    # same bouts, so they share the fight counts and last fight days
+    n_models = ratings.shape[1]
+    for i in range(red.shape[0]):
+        r = red[i]
+        b = blue[i]
+        for m in range(n_models):
+            red_initial[i, m] = ratings[r, m]
+            blue_initial[i, m] = ratings[b, m]
+
+        if winner[i] != NO_WINNER:
+            if winner[i] == RED:
+                w, l = r, b
+            else:
+                w, l = b, r
+            inactive_days = 0
+            if fight_counts[w] > 0:
+                inactive_days = day[i] - last_day[w]
+            has_market = market.shape[0] > 0 and not np.isnan(market[i])
+
+            for m in range(n_models):
+                winner_elo = float(ratings[w, m])
+                loser_elo = float(ratings[l, m])
+
+                # The winner's inactivity decay is applied to both fighters
+                if use_decay[m]:
+                    elo_decay = min(decay_rates[m] * inactive_days, decay_caps[m])
+                    winner_elo -= elo_decay
+                    loser_elo -= elo_decay
+
+                winner_fights = fight_counts[w] + fight_offsets[m]
+                loser_fights = fight_counts[l] + fight_offsets[m]
+                if winner_fights < 3:
+                    k_winner = k_table[m, 0]
+                elif winner_fights < 5:
+                    k_winner = k_table[m, 1]
+                else:
+                    k_winner = k_table[m, 2]
+                if loser_fights < 3:
+                    k_loser = k_table[m, 0]
+                elif loser_fights < 5:
+                    k_loser = k_table[m, 1]
+                else:
+                    k_loser = k_table[m, 2]
+
+                multiplier = multipliers[m, win_code[i]]
+                k_winner = k_winner * multiplier
+                k_loser = k_loser * multiplier
+
+                # Decay moves both ratings by the same amount, the difference stays whole
+                diff = ratings[l, m] - ratings[w, m]
+                expected_winner = _expected_score(diff)
+                expected_loser = _expected_score(-diff)
+
+                # A market probability for the bout pulls both expectations towards it
+                market_weight = market_weights[m]
+                if market_weight > 0 and has_market:
+                    market_winner = market[i] if winner[i] == RED else 1 - market[i]
+                    expected_winner = (1 - market_weight) * expected_winner + market_weight * market_winner
+                    expected_loser = (1 - market_weight) * expected_loser + market_weight * (1 - market_winner)
+
+                ratings[w, m] = round(winner_elo + k_winner * (1 - expected_winner))
+                ratings[l, m] = round(loser_elo - k_loser * expected_loser)
+
+        for m in range(n_models):
+            red_new[i, m] = ratings[r, m]
+            blue_new[i, m] = ratings[b, m]
+        fight_counts[r] += 1
+        fight_counts[b] += 1
+        last_day[r] = day[i]
+        last_day[b] = day[i]
+
+
+if njit is not None:
+    _replay_loop = njit(cache=True, nogil=True)(_replay_loop)
+
+
+def new_state(n_fighters, n_models=None):
+    # Every fighter on the starting rating, with ratings (fighters x models) when n_models is given
+    shape = n_fighters if n_models is None else (n_fighters, n_models)
+    return EngineState(np.full(shape, DEFAULT_ELO, dtype=RATING_DTYPE), np.zeros(n_fighters, dtype=COUNT_DTYPE),
+                       np.zeros(n_fighters, dtype=DAY_DTYPE))
+
+
+def grow_state(state, n_fighters):
+    # Copy of state with room for n_fighters, the added ones on the starting rating
+    grown = new_state(n_fighters, *state.ratings.shape[1:])
+    n = len(state.fight_counts)
+    for old, new in zip(state, grown):
+        new[:n] = old
+    return grown
+
+
+def _market_array(market):
+    # Without a market the kernel gets an empty array and never reads it
+    if market is None:
+        return np.empty(0)
+    return np.ascontiguousarray(market, dtype=np.float64)
+
+
+def market_probabilities(df):
+    # The red corner's vig-free market probability per bout, all NaN for data cleaned before the odds were kept
+    if 'R_prob' not in df:
+        return np.full(len(df), np.nan)
+    return df['R_prob'].to_numpy(dtype=np.float64)
+
+
+def _model_parameters(k_factors, decays, fight_offsets, market_weights):
+    # Kernel arrays for a list of models, decay None turns it off for that model
+    k_table = np.array([[float(k) for k in ks] for ks in k_factors], dtype=np.float64).reshape(-1, 3)
+    use_decay = np.array([decay is not None for decay in decays], dtype=np.bool_)
+    decay_rates = np.array([decay[0] if decay is not None else 0.0 for decay in decays], dtype=np.float64)
+    decay_caps = np.array([decay[1] if decay is not None else 0.0 for decay in decays], dtype=np.float64)
+    return (k_table, use_decay, decay_rates, decay_caps,
+            np.asarray(fight_offsets, dtype=np.int64), np.asarray(market_weights, dtype=np.float64))
+
+
+def replay_models(bouts, multipliers, k_factors, decays, fight_offsets, market=None, market_weights=None,
+                  winner=None, state=None, start=0, stop=None):
+    # replay for several models in one pass over the bouts. multipliers is a (models x win codes)
+    # table, the other parameters are lists with one entry per model. The Replay's per-bout
+    # arrays are (bouts x models) and its ratings (fighters x models), the fight counts and
+    # last days are shared. A state passed in has ratings laid out the same way
+    n_models = len(k_factors)
+    n_fighters = len(bouts.fighters)
+    if stop is None:
+        stop = len(bouts.red)
+    n_bouts = stop - start
+    if winner is None:
+        winner = bouts.winner
+    if market_weights is None:
+        market_weights = [0.0] * n_models
+
+    if state is None:
+        ratings, fight_counts, last_day = new_state(n_fighters, n_models)
+    else:
+        ratings = np.array(state.ratings, dtype=RATING_DTYPE).reshape(n_fighters, n_models)
+        fight_counts = np.array(state.fight_counts, dtype=COUNT_DTYPE)
+        last_day = np.array(state.last_day, dtype=DAY_DTYPE)
+    # The kernel writes the per-bout ratings straight into these columns
+    red_initial = np.empty((n_bouts, n_models), dtype=RATING_DTYPE)
+    blue_initial = np.empty((n_bouts, n_models), dtype=RATING_DTYPE)
+    red_new = np.empty((n_bouts, n_models), dtype=RATING_DTYPE)
+    blue_new = np.empty((n_bouts, n_models), dtype=RATING_DTYPE)
+
+    _replay_loop(
+        bouts.red[start:stop], bouts.blue[start:stop], np.asarray(winner, dtype=np.int8)[start:stop],
+        bouts.win_code[start:stop], bouts.day[start:stop],
+        np.asarray(multipliers, dtype=np.float64).reshape(n_models, -1),
+        *_model_parameters(k_factors, decays, fight_offsets, market_weights),
+        _market_array(market)[start:stop],
+        ratings, fight_counts, last_day,
+        red_initial, blue_initial, red_new, blue_new,
+    )
+    return Replay(red_initial, blue_initial, red_new, blue_new, ratings, fight_counts, last_day)
+
+
+def replay(bouts, multipliers, k_factors=(32, 32, 32), decay=None, fight_offset=0, winner=None,
+           state=None, start=0, stop=None, market=None, market_weight=0.0):
+    # Single pass over the bout arrays covering the simple, dynamic K, decay and market models.
+    # k_factors are used for < 3, < 5 and >= 5 fights, decay is (rate per day, cap) or None.
+    # market holds the red corner's vig-free market probability of every bout (NaN without one),
+    # the expected scores used in the update are blended with it by market_weight.
+    # Passing the state after bout start - 1 resumes the replay there, the per-bout ratings
+    # then cover bouts start to stop only. The state passed in is left untouched
+    result = replay_models(bouts, multipliers, [k_factors], [decay], [fight_offset], market, [market_weight],
+                           winner=winner, state=state, start=start, stop=stop)
+    return model_replay(result, 0)
+
+
+def model_replay(result, model):
+    # The Replay of one model out of replay_models
+    return result._replace(red_initial=result.red_initial[:, model], blue_initial=result.blue_initial[:, model],
+                           red_new=result.red_new[:, model], blue_new=result.blue_new[:, model],
+                           ratings=result.ratings[:, model])
+
+
+def update_elo(state, red, blue, winner, multiplier, day, k_factors=(32, 32, 32), decay=None, fight_offset=0,
+               market=None, market_weight=0.0):
+    # Rate a single bout between fighter ids red and blue, updating the state arrays in place.
+    # Same rules as replay, for callers that get bouts one at a time. Returns the new ratings
+    new = np.empty((4, 1, 1), dtype=RATING_DTYPE)
+    _replay_loop(
+        np.array([red], dtype=np.int32), np.array([blue], dtype=np.int32), np.array([winner], dtype=np.int8),
+        np.zeros(1, dtype=np.int8), np.array([day], dtype=np.int32),
+        np.array([[multiplier]], dtype=np.float64),
+        *_model_parameters([k_factors], [decay], [fight_offset], [market_weight]),
+        _market_array(None if market is None else [market]),
+        state.ratings[:, None], state.fight_counts, state.last_day,
+        new[0], new[1], new[2], new[3],
+    )
+    return int(new[2, 0, 0]), int(new[3, 0, 0])
+
+
+def _k_bucket(fights):
+    # Index into the (k1, k2, k3) K factors for a fight count
+    return np.where(fights < 3, 0, np.where(fights < 5, 1, 2)).astype(np.int8)
+
+
+def _sweep_loop(w_side, l_side, win_code, w_bucket, l_bucket, w_days,
+                multipliers, k_table, decay_rates, decay_caps, use_decay, ratings):
+    # Each column of ratings is one parameter set, each row one fighter
+    n_sets = ratings.shape[1]
+    for i in range(w_side.shape[0]):
+        w = w_side[i]
+        l = l_side[i]
+        if w < 0:
+            continue
+        code = win_code[i]
+        for p in range(n_sets):
+            winner_elo = ratings[w, p]
+            loser_elo = ratings[l, p]
+            if use_decay:
+                elo_decay = min(decay_rates[p] * w_days[i], decay_caps[p])
+                winner_elo -= elo_decay
+                loser_elo -= elo_decay
+
+            multiplier = multipliers[p, code]
+            k_winner = k_table[p, w_bucket[i]] * multiplier
+            k_loser = k_table[p, l_bucket[i]] * multiplier
+
+            diff = ratings[l, p] - ratings[w, p]
+            expected_winner = _expected_score(diff)
+            expected_loser = _expected_score(-diff)
+
+            ratings[w, p] = round(winner_elo + k_winner * (1 - expected_winner))
+            ratings[l, p] = round(loser_elo - k_loser * expected_loser)
+
+
+def _sweep_vectorized(w_side, l_side, win_code, w_bucket, l_bucket, w_days,
+                      multipliers, k_table, decay_rates, decay_caps, use_decay, ratings):
+    # Same update as _sweep_loop with NumPy doing the work across parameter sets
+    for i in range(w_side.shape[0]):
+        w = w_side[i]
+        l = l_side[i]
+        if w < 0:
+            continue
+        winner_elo = ratings[w]
+        loser_elo = ratings[l]
+        if use_decay:
+            elo_decay = np.minimum(decay_rates * w_days[i], decay_caps)
+            winner_elo = winner_elo - elo_decay
+            loser_elo = loser_elo - elo_decay
+
+        multiplier = multipliers[:, win_code[i]]
+        k_winner = k_table[:, w_bucket[i]] * multiplier
+        k_loser = k_table[:, l_bucket[i]] * multiplier
+
+        diff = ratings[l] - ratings[w]
+        expected_winner = expected_scores(diff)
+        expected_loser = expected_scores(-diff)
+
+        ratings[w] = np.rint(winner_elo + k_winner * (1 - expected_winner))
+        ratings[l] = np.rint(loser_elo - k_loser * expected_loser)
+
+
+if njit is not None:
+    _sweep_kernel = njit(cache=True, nogil=True)(_sweep_loop)
+else:
+    _sweep_kernel = _sweep_vectorized
+
+
+def replay_sweep(bouts, multipliers, k_factors, decay=None, fight_offset=0, winner=None, history=None):
+    # Replay the bouts once for many parameter sets at a time and return the final
+    # ratings as a (fighters x parameter sets) matrix. multipliers is a (sets x win codes)
+    # table from multiplier_table, k_factors and decay hold one value or array per set
+    multipliers = np.atleast_2d(np.asarray(multipliers, dtype=np.float64))
+    n_sets = multipliers.shape[0]
+    k_table = np.stack(np.broadcast_arrays(*[np.broadcast_to(np.asarray(k, dtype=np.float64), (n_sets,)) for k in k_factors]), axis=1)
+    if decay is not None:
+        decay_rates = np.ascontiguousarray(np.broadcast_to(np.asarray(decay[0], dtype=np.float64), (n_sets,)))
+        decay_caps = np.ascontiguousarray(np.broadcast_to(np.asarray(decay[1], dtype=np.float64), (n_sets,)))
+    else:
+        decay_rates = decay_caps = np.zeros(n_sets)
+
+    if winner is None:
+        winner = bouts.winner
+    winner = np.asarray(winner)
+    if history is None:
+        history = fight_history(bouts)
+    red_fights, blue_fights, red_days, blue_days = history
+
+    red_wins = winner == RED
+    w_side = np.where(red_wins, bouts.red, bouts.blue).astype(np.int64)
+    l_side = np.where(red_wins, bouts.blue, bouts.red).astype(np.int64)
+    w_side[winner == NO_WINNER] = -1
+    w_bucket = _k_bucket(np.where(red_wins, red_fights, blue_fights) + fight_offset)
+    l_bucket = _k_bucket(np.where(red_wins, blue_fights, red_fights) + fight_offset)
+    w_days = np.where(red_wins, red_days, blue_days).astype(np.float64)
+
+    ratings = np.full((len(bouts.fighters), n_sets), float(DEFAULT_ELO))
+    _sweep_kernel(w_side, l_side, bouts.win_code.astype(np.int64), w_bucket, l_bucket, w_days,
+                  multipliers, k_table, decay_rates, decay_caps, decay is not None, ratings)
+    return ratings
+
+
+def share_bouts(bouts, history=None):
+    # Copy the bout arrays and their fight history, if given, into one shared memory block so
+    # process pool workers can map them instead of receiving a pickled copy per task
+    arrays = {
+        'red': bouts.red, 'blue': bouts.blue, 'winner': bouts.winner,
+        'win_code': bouts.win_code, 'day': bouts.day,
+    }
+    if history is not None:
+        red_fights, blue_fights, red_days, blue_days = history
+        arrays.update(red_fights=red_fights, blue_fights=blue_fights, red_days=red_days, blue_days=blue_days)
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        offset = (offset + 7) // 8 * 8
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset += array.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, dtype, shape, start in layout:
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[:] = arrays[name]
+    # The spec is all a worker needs to attach, the names travel once per worker
+    spec = (shm.name, layout, list(bouts.fighters), bouts.win_types)
+    return shm, spec
+
+
+def attach_bouts(spec):
+    # Worker side of share_bouts, the returned arrays are views into the shared block.
+    # Keep the returned SharedMemory alive for as long as the arrays are used
+    name, layout, fighters, win_types = spec
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = {
+        field: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        for field, dtype, shape, start in layout
+    }
+    bouts = Bouts(
+        fighters=np.asarray(fighters, dtype=object),
+        red=arrays['red'],
+        blue=arrays['blue'],
+        winner=arrays['winner'],
+        win_code=arrays['win_code'],
+        win_types=win_types,
+        day=arrays['day'],
+    )
+    history = None
+    if 'red_fights' in arrays:
+        history = (arrays['red_fights'], arrays['blue_fights'], arrays['red_days'], arrays['blue_days'])
+    return shm, bouts, history
+
+
+# Output column for each market column of the cleaned data
+ODDS_COLUMNS = {'red odds': 'R_odds', 'blue odds': 'B_odds', 'red market prob': 'R_prob', 'blue market prob': 'B_prob'}
+
+
+def rating_frame(df, result):
+    # Per-bout output in the same layout the rating scripts have always written
+    with stage('rate.frame', rows=len(df)):
+        return _rating_frame(df, result)
+
+
+def _rating_frame(df, result):
+    new_df = pd.DataFrame({
+        'red fighter': df['R_fighter'].to_numpy(),
+        'red fighter initial elo': result.red_initial,
+        'blue fighter': df['B_fighter'].to_numpy(),
+        'blue fighter initial elo': result.blue_initial,
+        'date': df['date'].to_numpy(),
+        'winner': df['Winner'].to_numpy(),
+        'win_type': df['win_type'].to_numpy(),
+        'red fighter new elo': result.red_new,
+        'blue fighter new elo': result.blue_new,
+        'favorite': df['Favorite'].to_numpy(),
+    })
+    # Moneylines and market probabilities, for data cleaned with them
+    for column, source in ODDS_COLUMNS.items():
+        if source in df:
+            new_df[column] = df[source].to_numpy()
+    # Reverse it to display the latest matches last
+    return new_df.iloc[::-1]
+
+
+def current_ratings_frame(fighters, ratings):
+    # Latest rating of every fighter, highest first
+    current = pd.DataFrame({'Fighter': np.asarray(fighters, dtype=object), 'Current ELO': ratings})
+    return current.sort_values(by='Current ELO', ascending=False, kind='stable')
+
+
+def models_fingerprint(models):
+    # The settings of a rate_models list of models, in order, as a string to store with a snapshot.
+    # Defaults are filled in, so leaving an option out and passing its default match
+    return json.dumps([{'multipliers': {win_type: float(value) for win_type, value in sorted(multiplier_dict.items())},
+                        'k_factors': [float(k) for k in replay_options.get('k_factors', (32, 32, 32))],
+                        'decay': None if replay_options.get('decay') is None
+                        else [float(value) for value in replay_options['decay']],
+                        'fight_offset': int(replay_options.get('fight_offset', 0)),
+                        'market_weight': float(replay_options.get('market_weight', 0.0))}
+                       for multiplier_dict, replay_options in models])
+
+
+def save_snapshot(snapshot_file, fighters, state, n_bouts, last_day, models=''):
+    # End state of a replay plus how many bouts it covered, up to and including last_day,
+    # and the models_fingerprint of the models that rated them
+    np.savez(snapshot_file, fighters=np.asarray(fighters, dtype=str), ratings=state.ratings,
+             fight_counts=state.fight_counts, last_day=state.last_day,
+             n_bouts=n_bouts, last_bout_day=last_day, models=models)
+
+
+def load_snapshot(snapshot_file):
+    # Returns the fighters, state, bout count, last day and models fingerprint of a snapshot
+    with np.load(snapshot_file) as snapshot:
+        # Snapshots saved before the state was compact hold 64-bit arrays, and those saved
+        # before the models were recorded have an empty fingerprint
+        state = EngineState(snapshot['ratings'].astype(RATING_DTYPE), snapshot['fight_counts'].astype(COUNT_DTYPE),
+                            snapshot['last_day'].astype(DAY_DTYPE))
+        models = str(snapshot['models']) if 'models' in snapshot.files else ''
+        return (list(snapshot['fighters']), state, int(snapshot['n_bouts']), int(snapshot['last_bout_day']),
+                models)
+
+
+def rate_models(df, models, snapshot_file=None):
+    # Replay the bouts of a frame from load_bouts for several models at once. models is a list of
+    # (multiplier_dict, replay options) pairs, the options being k_factors, decay, fight_offset and
+    # market_weight as for replay, and the Replay has one column per model. With a snapshot from an
+    # earlier run of the same models only the bouts dated after it are replayed, starting from its
+    # state, unless bouts have been added on or before the snapshot's last day or the models'
+    # settings differ from the ones it was saved with, which needs a full recompute. Returns the replayed part of df, its Bouts and Replay, and whether it was a full recompute
+    n_models = len(models)
+    day = day_numbers(df['date'])
+    fingerprint = models_fingerprint(models)
+    fighters, state, n_done, last_day = None, None, 0, None
+    if snapshot_file is not None and os.path.exists(snapshot_file):
+        fighters, state, n_done, last_day, saved_models = load_snapshot(snapshot_file)
+        if (saved_models == fingerprint and np.count_nonzero(day <= last_day) == n_done
+                and state.ratings.size == len(fighters) * n_models):
+            df = df[day > last_day]
+            state = state._replace(ratings=state.ratings.reshape(len(fighters), n_models))
+        else:
+            fighters, state, n_done, last_day = None, None, 0, None
+    full = state is None
+
+    with stage('rate.prepare', rows=len(df)):
+        bouts = prepare_bouts(df, fighters)
+    if state is not None:
+        # Fighters making their debut start from the default state
+        state = grow_state(state, len(bouts.fighters))
+
+    options = [replay_options for _, replay_options in models]
+    multipliers = np.stack([multiplier_table(bouts, multiplier_dict) for multiplier_dict, _ in models])
+    market_weights = [replay_options.get('market_weight', 0.0) for replay_options in options]
+    market = market_probabilities(df) if any(market_weights) else None
+    with stage('rate.replay', rows=len(df), iterations=n_models):
+        result = replay_models(bouts, multipliers,
+                               [replay_options.get('k_factors', (32, 32, 32)) for replay_options in options],
+                               [replay_options.get('decay') for replay_options in options],
+                               [replay_options.get('fight_offset', 0) for replay_options in options],
+                               market, market_weights, state=state)
+
+    if snapshot_file is not None:
+        if len(df):
+            last_day = int(bouts.day.max())
+        elif last_day is None:
+            last_day = 0
+        # A single model keeps the one-dimensional ratings live_ratings reads
+        saved = model_replay(result, 0) if n_models == 1 else result
+        save_snapshot(snapshot_file, bouts.fighters, saved, n_done + len(df), last_day, fingerprint)
+    return df, bouts, result, full
+
+
+def rate_bouts(df, multiplier_dict, snapshot_file=None, **replay_options):
+    # rate_models for a single model, returning its one-dimensional Replay
+    df, bouts, result, full = rate_models(df, [(multiplier_dict, replay_options)], snapshot_file)
+    return df, bouts, model_replay(result, 0), full
+
+
+def write_rating_frame(new_df, output_file, append=False):
+    # With append the rows are added to an existing output, which lists the latest bouts
+    # first, so they go right below the header instead of at the end of the file.
+    # Output paths ending in .cols are written as a column store instead of a CSV
+    with stage('rate.write', rows=len(new_df)):
+        if is_column_store(output_file):
+            write_table(new_df, output_file, append=append)
+            return
+        if not append or not os.path.exists(output_file):
+            new_df.to_csv(output_file, index=False)
+            return
+        with open(output_file, newline='') as f:
+            header = f.readline()
+            rest = f.read()
+        with open(output_file, 'w', newline='') as f:
+            f.write(header)
+            new_df.to_csv(f, index=False, header=False)
+            f.write(rest)
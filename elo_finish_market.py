@@ -0,0 +1,30 @@
+from elo_engine import load_bouts, rate_bouts, rating_frame, write_rating_frame, current_ratings_frame
+from elo_finish_decay import multiplier_dict, k_factors, decay_factor_per_day, cap
+
+
+# Weight of the betting market's vig-free probability in the expected scores of each update,
+# 0 gives the decay model and 1 rates fighters on how they did against the market only
+market_weight = 0.5
+
+def calculate_elo(input_file, output_file, snapshot_file=None, current_file=None):
+    # Sort DataFrame by date after parsing dates
+    df = load_bouts(input_file)
+
+    # The decay model's parameters with the market as a prior for every bout that has odds.
+    # Data cleaned before the odds were kept has no market and gives the decay model's ratings
+    df, bouts, result, full = rate_bouts(df, multiplier_dict, snapshot_file=snapshot_file, k_factors=k_factors,
+                                         decay=(decay_factor_per_day, cap), fight_offset=1,
+                                         market_weight=market_weight)
+
+    new_df = rating_frame(df, result)
+    write_rating_frame(new_df, output_file, append=not full)
+    if current_file is not None:
+        current_ratings_frame(bouts.fighters, result.ratings).to_csv(current_file, index=False)
+    print(f'Elo scores calculated and saved to {output_file}')
+
+if __name__ == "__main__":
+    input_file = '/Users/richie/Documents/git_hub/elo_project/ufc/cleaned_ufc_data_with_finish.csv'  
+    output_file = 'elo_scores_with_finish_multiplier_market.csv'
+    snapshot_file = None  # e.g. 'elo_state_market.npz' to only rate new bouts on later runs
+    current_file = None  # e.g. 'current_elo_scores_market.csv' for the latest rating of every fighter
+    calculate_elo(input_file, output_file, snapshot_file=snapshot_file, current_file=current_file)
@@ -0,0 +1,157 @@
+import math
+import numpy as np
+from collections import namedtuple
+
+from elo_engine import DEFAULT_ELO, NO_WINNER, RATING_DTYPE, RED
+from instrumentation import profiled
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the period loop also runs as plain Python
+    njit = None
+
+
+'''
+Glicko-2 ratings with a rating deviation and volatility per fighter.
+
+Every card (all bouts on one date) is a rating period: the bouts of a card are scored
+against the ratings everyone had going into it and all of its fighters are updated
+together afterwards. A fighter's deviation grows by one volatility step for every card
+they sit out, applied when they next fight.
+
+Ratings are reported on the Elo scale centred on DEFAULT_ELO, so a debut is 1000 like
+in the Elo models, and glicko_replay returns the per-bout columns elo_engine.rating_frame
+writes, so the comparison and betting scripts read its output unchanged.
+'''
+
+
+# Glicko-2 works on (rating - DEFAULT_ELO) / GLICKO_SCALE
+GLICKO_SCALE = 173.7178
+
+# Convergence tolerance of the volatility iteration
+_TOLERANCE = 1e-6
+
+# Per-bout ratings (rounded like the Elo outputs) plus each fighter's state after the last card
+GlickoReplay = namedtuple('GlickoReplay', ['red_initial', 'blue_initial', 'red_new', 'blue_new',
+                                           'ratings', 'deviations', 'volatilities'])
+
+
+def _volatility(phi, sigma, v, delta, tau):
+    # New volatility by the Illinois iteration in step 5 of Glickman's Glicko-2 paper
+    a = math.log(sigma * sigma)
+    phi2 = phi * phi
+
+    def f(x):
+        ex = math.exp(x)
+        return ex * (delta * delta - phi2 - v - ex) / (2 * (phi2 + v + ex) ** 2) - (x - a) / (tau * tau)
+
+    big_a = a
+    if delta * delta > phi2 + v:
+        big_b = math.log(delta * delta - phi2 - v)
+    else:
+        k = 1
+        while f(a - k * tau) < 0:
+            k += 1
+        big_b = a - k * tau
+    f_a = f(big_a)
+    f_b = f(big_b)
+    while abs(big_b - big_a) > _TOLERANCE:
+        big_c = big_a + (big_a - big_b) * f_a / (f_b - f_a)
+        f_c = f(big_c)
+        if f_c * f_b <= 0:
+            big_a = big_b
+            f_a = f_b
+        else:
+            f_a = f_a / 2
+        big_b = big_c
+        f_b = f_c
+    return math.exp(big_a / 2)
+
+
+def _glicko_loop(red, blue, winner, card_starts, tau, mu, phi, sigma, last_card,
+                 v_inverse, delta_sum, red_initial, blue_initial, red_new, blue_new):
+    g_factor = 3 / (math.pi * math.pi)
+    for card in range(card_starts.shape[0] - 1):
+        start = card_starts[card]
+        stop = card_starts[card + 1]
+
+        # Bring the deviation of everyone on the card up to the start of it and clear their
+        # totals, including those of fighters who were also on the card before
+        for i in range(start, stop):
+            for f in (red[i], blue[i]):
+                if last_card[f] < card - 1:
+                    if last_card[f] >= 0:
+                        missed = card - 1 - last_card[f]
+                        phi[f] = math.sqrt(phi[f] * phi[f] + missed * sigma[f] * sigma[f])
+                    last_card[f] = card - 1
+                v_inverse[f] = 0.0
+                delta_sum[f] = 0.0
+            red_initial[i] = mu[red[i]]
+            blue_initial[i] = mu[blue[i]]
+
+        # Score every bout against the ratings going into the card
+        for i in range(start, stop):
+            if winner[i] == NO_WINNER:
+                continue
+            r = red[i]
+            b = blue[i]
+            red_score = 1.0 if winner[i] == RED else 0.0
+            g_blue = 1 / math.sqrt(1 + g_factor * phi[b] * phi[b])
+            g_red = 1 / math.sqrt(1 + g_factor * phi[r] * phi[r])
+            e_red = 1 / (1 + math.exp(-g_blue * (red_initial[i] - blue_initial[i])))
+            e_blue = 1 / (1 + math.exp(-g_red * (blue_initial[i] - red_initial[i])))
+            v_inverse[r] += g_blue * g_blue * e_red * (1 - e_red)
+            delta_sum[r] += g_blue * (red_score - e_red)
+            v_inverse[b] += g_red * g_red * e_blue * (1 - e_blue)
+            delta_sum[b] += g_red * (1 - red_score - e_blue)
+
+        # Update each fighter with a scored bout once, from their totals over the card
+        for i in range(start, stop):
+            for f in (red[i], blue[i]):
+                if last_card[f] == card or v_inverse[f] == 0.0:
+                    continue
+                v = 1 / v_inverse[f]
+                new_sigma = _volatility(phi[f], sigma[f], v, v * delta_sum[f], tau)
+                phi_star = math.sqrt(phi[f] * phi[f] + new_sigma * new_sigma)
+                phi[f] = 1 / math.sqrt(1 / (phi_star * phi_star) + 1 / v)
+                mu[f] = mu[f] + phi[f] * phi[f] * delta_sum[f]
+                sigma[f] = new_sigma
+                last_card[f] = card
+
+        for i in range(start, stop):
+            red_new[i] = mu[red[i]]
+            blue_new[i] = mu[blue[i]]
+
+
+if njit is not None:
+    _volatility = njit(cache=True, nogil=True)(_volatility)
+    _glicko_loop = njit(cache=True, nogil=True)(_glicko_loop)
+
+
+def card_starts(day):
+    # Index of the first bout of every card plus the end, bouts being in date order
+    return np.concatenate([[0], np.flatnonzero(np.diff(day)) + 1, [len(day)]]).astype(np.int64)
+
+
+@profiled('rate.glicko')
+def glicko_replay(bouts, tau=0.5, initial_deviation=350.0, initial_volatility=0.06, winner=None):
+    # Replay the bouts card by card. Deviations are on the rating scale, tau limits how fast
+    # volatility changes (0.3 to 1.2 is the usual range)
+    n_fighters = len(bouts.fighters)
+    n_bouts = len(bouts.red)
+    if winner is None:
+        winner = bouts.winner
+
+    mu = np.zeros(n_fighters)
+    phi = np.full(n_fighters, initial_deviation / GLICKO_SCALE)
+    sigma = np.full(n_fighters, float(initial_volatility))
+    last_card = np.full(n_fighters, -1, dtype=np.int64)
+    per_bout = [np.empty(n_bouts) for _ in range(4)]
+
+    _glicko_loop(bouts.red, bouts.blue, np.asarray(winner, dtype=np.int8), card_starts(bouts.day), float(tau),
+                 mu, phi, sigma, last_card, np.zeros(n_fighters), np.zeros(n_fighters), *per_bout)
+
+    red_initial, blue_initial, red_new, blue_new = (
+        np.rint(DEFAULT_ELO + GLICKO_SCALE * column).astype(RATING_DTYPE) for column in per_bout)
+    return GlickoReplay(red_initial, blue_initial, red_new, blue_new,
+                        DEFAULT_ELO + GLICKO_SCALE * mu, GLICKO_SCALE * phi, sigma)
@@ -0,0 +1,31 @@
+from elo_engine import load_bouts, prepare_bouts, rating_frame, write_rating_frame, current_ratings_frame
+from glicko_engine import glicko_replay
+
+# Glicko-2 system constant and the starting deviation and volatility of a debut
+tau = 0.5
+initial_deviation = 350
+initial_volatility = 0.06
+
+def calculate_glicko(input_file, output_file, current_file=None):
+    # Sort DataFrame by date after parsing dates
+    df = load_bouts(input_file)
+
+    # Every card is one rating period, its bouts are rated together
+    bouts = prepare_bouts(df)
+    result = glicko_replay(bouts, tau=tau, initial_deviation=initial_deviation, initial_volatility=initial_volatility)
+
+    # Same layout as the Elo outputs, latest matches first
+    new_df = rating_frame(df, result)
+    write_rating_frame(new_df, output_file)
+    if current_file is not None:
+        current = current_ratings_frame(bouts.fighters, result.ratings.round().astype(int))
+        current['Deviation'] = result.deviations[current.index].round(1)
+        current.to_csv(current_file, index=False)
+    print(f'Glicko-2 ratings calculated and saved to {output_file}')
+
+if __name__ == "__main__":
+    input_file_path = '/Users/richie/Documents/git_hub/elo_project/ufc/cleaned_ufc_data_with_finish.csv'
+    output_file_path = 'elo_scores_glicko.csv'
+    current_file_path = None  # e.g. 'current_glicko_scores.csv' for the latest rating and deviation of every fighter
+
+    calculate_glicko(input_file_path, output_file_path, current_file=current_file_path)
@@ -0,0 +1,239 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+'''
+Opt-in timing of the pipeline stages.
+
+Code marks its stages with
+
+    with stage('replay', rows=len(bouts.red)):
+        ...
+
+and nothing is recorded unless instrumentation is on, in which case every stage name
+collects its calls, wall time, rows (rows per second) and iterations (cost per
+iteration), and with memory tracking its peak traced memory. When it is off, stage()
+hands back one shared do-nothing context, which is all a profiled() function adds to
+its calls.
+
+Turn it on for a whole run with environment variables, set before the run starts:
+
+    ELO_PROFILE=1                  print the stage summary when the process exits
+    ELO_PROFILE=summary.json       ... and also write it as JSON
+    ELO_PROFILE_MEMORY=1           track peak memory per stage (tracemalloc, slower)
+    ELO_PROFILE_SAMPLES=run.folded sample the call stack every 5 ms and write it in the
+                                   collapsed format flamegraph.pl and speedscope read
+
+or from code with enable(), summary(), report() and the sampling() context manager.
+'''
+
+
+class _Stats:
+    __slots__ = ('calls', 'seconds', 'rows', 'iterations', 'peak')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.iterations = 0
+        self.peak = 0
+
+
+class _Stage:
+    # A running stage, rows and iterations can be added while it runs
+    __slots__ = ('name', 'rows', 'iterations', 'start')
+
+    def __init__(self, name, rows, iterations):
+        self.name = name
+        self.rows = rows or 0
+        self.iterations = iterations or 0
+
+    def __enter__(self):
+        if _memory:
+            # The peak so far belongs to the enclosing stage, then each stage measures its own
+            if _peaks:
+                _peaks[-1] = max(_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            _peaks.append(0)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            stats = _stats.get(self.name)
+            if stats is None:
+                stats = _stats[self.name] = _Stats()
+            stats.calls += 1
+            stats.seconds += elapsed
+            stats.rows += self.rows
+            stats.iterations += self.iterations
+            if _memory and _peaks:
+                peak = max(_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                stats.peak = max(stats.peak, peak)
+                if _peaks:
+                    _peaks[-1] = max(_peaks[-1], peak)
+        return False
+
+
+class _NullStage:
+    # What stage() returns while instrumentation is off
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    rows = 0
+    iterations = 0
+
+
+_NULL_STAGE = _NullStage()
+_enabled = False
+_memory = False
+_stats = {}
+_peaks = []
+_lock = threading.Lock()
+
+
+def enable(memory=False):
+    global _enabled, _memory
+    _enabled = True
+    if memory and not _memory:
+        tracemalloc.start()
+        _memory = True
+
+
+def disable():
+    global _enabled, _memory
+    _enabled = False
+    if _memory:
+        tracemalloc.stop()
+        _memory = False
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def stage(name, rows=None, iterations=None):
+    # Context manager timing one stage, see the module docstring
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, rows, iterations)
+
+
+def profiled(name=None):
+    # Decorator timing every call as a stage. Whether instrumentation is on is checked on
+    # every call, so functions decorated at import time are timed once it is enabled
+    def decorate(function):
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(label):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def summary():
+    # Per-stage totals as plain dicts, in the order the stages first finished
+    with _lock:
+        items = list(_stats.items())
+    result = {}
+    for name, stats in items:
+        result[name] = {
+            'calls': stats.calls,
+            'seconds': stats.seconds,
+            'rows': stats.rows or None,
+            'rows_per_second': stats.rows / stats.seconds if stats.rows and stats.seconds else None,
+            'iterations': stats.iterations or None,
+            'seconds_per_iteration': stats.seconds / stats.iterations if stats.iterations else None,
+            'peak_mb': stats.peak / 2 ** 20 if _memory else None,
+        }
+    return result
+
+
+def dump(path):
+    with open(path, 'w') as f:
+        json.dump(summary(), f, indent=2)
+
+
+def report(file=None):
+    file = file or sys.stderr
+    print(f'{"stage":<32}{"calls":>7}{"seconds":>11}{"rows/s":>14}{"s/iter":>12}{"peak MB":>10}', file=file)
+    for name, s in summary().items():
+        rate = f'{s["rows_per_second"]:,.0f}' if s['rows_per_second'] else ''
+        per_iteration = f'{s["seconds_per_iteration"]:.2e}' if s['seconds_per_iteration'] else ''
+        peak = f'{s["peak_mb"]:.1f}' if s['peak_mb'] is not None else ''
+        print(f'{name:<32}{s["calls"]:>7}{s["seconds"]:>11.4f}{rate:>14}{per_iteration:>12}{peak:>10}', file=file)
+
+
+class sampling:
+    # Samples the call stack of a thread (the one entering by default) every interval seconds
+    # and writes the counts in the collapsed "frame;frame;frame count" format on exit
+    def __init__(self, path, interval=0.005, thread_id=None):
+        self.path = path
+        self.interval = interval
+        self.thread_id = thread_id
+        self.counts = Counter()
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        with open(self.path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f'{stack} {count}\n')
+        return False
+
+
+def _from_environment():
+    setting = os.environ.get('ELO_PROFILE')
+    samples = os.environ.get('ELO_PROFILE_SAMPLES')
+    if setting:
+        enable(memory=os.environ.get('ELO_PROFILE_MEMORY', '') not in ('', '0'))
+
+        def finish():
+            report()
+            if setting.endswith('.json'):
+                dump(setting)
+        atexit.register(finish)
+    if samples:
+        sampler = sampling(samples).__enter__()
+        atexit.register(sampler.__exit__, None, None, None)
+
+
+_from_environment()
@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import date
+
+from date_ingest import day_number
+from elo_engine import (BLUE, DEFAULT_ELO, NO_WINNER, RED, expected_scores, grow_state, load_snapshot,
+                        models_fingerprint, new_state, update_elo)
+from elo_finish_decay import cap, decay_factor_per_day, k_factors, multiplier_dict
+
+
+'''
+Rating updates on fight night, as each result comes in.
+
+Events arrive as one JSON object per line, from stdin, a file that is being appended
+to, or TCP connections. A card lists the bouts still to come, a result rates one bout
+and only touches the two fighters in it:
+
+    {"type": "card", "bouts": [{"red": "Jon Jones", "blue": "Ciryl Gane"}, ...]}
+    {"type": "result", "red": "Jon Jones", "blue": "Ciryl Gane", "winner": "Red",
+     "win_type": "submission", "date": "2023-03-04"}
+
+Every result publishes the fighters' new ratings and the pre-fight win probabilities
+of the rest of the card as a JSON line on stdout. Start from the snapshot a rating
+script saved (snapshot_file in elo_finish_decay.py) to carry the full history:
+
+    python live_ratings.py --snapshot elo_state_decay.npz < results.jsonl
+    python live_ratings.py --snapshot elo_state_decay.npz --follow results.jsonl
+    python live_ratings.py --snapshot elo_state_decay.npz --listen 127.0.0.1:9000
+
+The snapshot must come from the model the stream is rated with, the decay model's
+parameters by default.
+'''
+
+
+# Parameters of the decay model, taken from its script so a retune reaches the live feed
+DECAY_MULTIPLIERS = multiplier_dict
+DECAY_OPTIONS = {'k_factors': k_factors, 'decay': (decay_factor_per_day, cap), 'fight_offset': 1}
+
+WINNER_CODES = {'Red': RED, 'Blue': BLUE}
+
+
+class LiveRatings:
+    def __init__(self, multiplier_dict, k_factors=(32, 32, 32), decay=None, fight_offset=0, fighters=(), state=None):
+        self.multiplier_dict = multiplier_dict
+        self.k_factors = k_factors
+        self.decay = decay
+        self.fight_offset = fight_offset
+        self.fighters = list(fighters)
+        self.ids = {name: i for i, name in enumerate(self.fighters)}
+        self.card = []
+
+        # State arrays have spare room so debuts rarely need to grow them
+        capacity = max(64, 2 * len(self.fighters))
+        self.state = new_state(capacity) if state is None else grow_state(state, capacity)
+
+        # Load the compiled update before the first result arrives instead of on it
+        update_elo(new_state(2), RED, BLUE, RED, 1.0, 0, k_factors, decay, fight_offset)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_file, multiplier_dict, **options):
+        fighters, state, _, _, models = load_snapshot(snapshot_file)
+        # Snapshots saved before the models were recorded are taken on trust
+        if models and models != models_fingerprint([(multiplier_dict, options)]):
+            raise ValueError(f'{snapshot_file} was saved by a model with other settings')
+        return cls(multiplier_dict, fighters=fighters, state=state, **options)
+
+    def _fighter_id(self, name):
+        fighter_id = self.ids.get(name)
+        if fighter_id is None:
+            fighter_id = len(self.fighters)
+            if fighter_id == len(self.state.ratings):
+                self.state = grow_state(self.state, 2 * fighter_id)
+            self.fighters.append(name)
+            self.ids[name] = fighter_id
+        return fighter_id
+
+    def rating(self, fighter):
+        fighter_id = self.ids.get(fighter)
+        return DEFAULT_ELO if fighter_id is None else int(self.state.ratings[fighter_id])
+
+    def win_probability(self, red, blue):
+        # Expected score of the red corner going into the bout
+        return float(expected_scores(self.rating(blue) - self.rating(red)))
+
+    def update(self, red, blue, winner, win_type, on=None):
+        # Rate one bout, returns the new red and blue ratings
+        day = day_number(on if on is not None else date.today())
+        red_id, blue_id = self._fighter_id(red), self._fighter_id(blue)  # May grow the state arrays
+        return update_elo(self.state, red_id, blue_id,
+                          WINNER_CODES.get(winner, NO_WINNER), self.multiplier_dict.get(win_type, 1.0), day,
+                          self.k_factors, self.decay, self.fight_offset)
+
+    def upcoming(self):
+        return [{'red': red, 'blue': blue, 'red_win_probability': self.win_probability(red, blue)}
+                for red, blue in self.card]
+
+    def handle(self, event):
+        # Apply one feed event, returns the message to publish
+        if event['type'] == 'card':
+            self.card = [(bout['red'], bout['blue']) for bout in event['bouts']]
+            return {'type': 'card', 'upcoming': self.upcoming()}
+        if event['type'] == 'result':
+            red, blue = event['red'], event['blue']
+            red_before, blue_before = self.rating(red), self.rating(blue)
+            red_elo, blue_elo = self.update(red, blue, event.get('winner'), event.get('win_type', 'unknown'), event.get('date'))
+            self.card = [bout for bout in self.card if set(bout) != {red, blue}]
+            return {'type': 'ratings', 'red': red, 'red_elo': red_elo, 'red_change': red_elo - red_before,
+                    'blue': blue, 'blue_elo': blue_elo, 'blue_change': blue_elo - blue_before,
+                    'upcoming': self.upcoming()}
+        raise ValueError(f"Unknown event type: {event['type']}")
+
+
+async def stdin_lines():
+    loop = asyncio.get_running_loop()
+    try:
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except ValueError:
+        # Regular files redirected to stdin can't be watched by the event loop
+        while line := await loop.run_in_executor(None, sys.stdin.buffer.readline):
+            yield line
+        return
+    while line := await reader.readline():
+        yield line
+
+
+async def follow_lines(path, poll=0.05):
+    # Lines of a file as they are appended to it, like tail -f from the start of the file
+    with open(path, 'rb') as f:
+        partial = b''
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll)
+                continue
+            partial += line
+            if partial.endswith(b'\n'):
+                yield partial
+                partial = b''
+
+
+async def socket_lines(host, port):
+    # Lines from every client connected to host:port, in the order they arrive
+    queue = asyncio.Queue()
+
+    async def receive(reader, writer):
+        while line := await reader.readline():
+            await queue.put(line)
+        writer.close()
+
+    server = await asyncio.start_server(receive, host, port)
+    async with server:
+        print(f'Listening for results on {host}:{port}', file=sys.stderr)
+        while True:
+            yield await queue.get()
+
+
+async def run(live, lines, publish=None):
+    # Apply every event from an async iterator of JSON lines and publish what each one returns
+    if publish is None:
+        def publish(message):
+            sys.stdout.write(json.dumps(message) + '\n')
+            sys.stdout.flush()
+
+    async for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        start = time.perf_counter()
+        try:
+            message = live.handle(json.loads(line))
+        except (KeyError, ValueError, TypeError) as e:
+            # A bad event is reported and the feed keeps going
+            message = {'type': 'error', 'error': str(e), 'event': line.decode(errors='replace')}
+        message['latency_ms'] = (time.perf_counter() - start) * 1000
+        publish(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update ratings live from a feed of bout results')
+    parser.add_argument('--snapshot', help='engine snapshot saved by a rating script to start from')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--follow', metavar='FILE', help='read events appended to a file')
+    source.add_argument('--listen', metavar='HOST:PORT', help='accept events over TCP')
+    args = parser.parse_args()
+
+    if args.snapshot:
+        live = LiveRatings.from_snapshot(args.snapshot, DECAY_MULTIPLIERS, **DECAY_OPTIONS)
+    else:
+        live = LiveRatings(DECAY_MULTIPLIERS, **DECAY_OPTIONS)
+
+    if args.follow:
+        lines = follow_lines(args.follow)
+    elif args.listen:
+        host, port = args.listen.rsplit(':', 1)
+        lines = socket_lines(host, int(port))
+    else:
+        lines = stdin_lines()
+
+    try:
+        asyncio.run(run(live, lines))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import numpy as np
+
+
+'''
+Betting market prices as probabilities.
+
+The raw feed quotes American moneylines: -150 means staking 150 to win 100, +130 means
+staking 100 to win 130. The implied probability of a line is the stake over the total
+returned, and the two sides of a bout add up to more than 1 by the bookmaker's margin
+(the vig). Normalising the pair to sum to 1 removes it:
+
+    red_prob = implied(R_odds) / (implied(R_odds) + implied(B_odds))
+
+Lines between -100 and +100 (exclusive) are not valid American odds and, like missing
+lines, give NaN, so bouts without a market stay out of anything computed from it.
+'''
+
+
+def _valid(odds):
+    odds = np.asarray(odds, dtype=np.float64)
+    return np.where(np.abs(odds) >= 100, odds, np.nan)
+
+
+def implied_probability(odds):
+    # Probability implied by American odds, vig included: stake / (stake + winnings)
+    odds = _valid(odds)
+    return np.where(odds < 0, -odds, 100) / (100 + np.abs(odds))
+
+
+def decimal_odds(odds):
+    # Total returned per unit staked (stake included) at American odds
+    return 1 / implied_probability(odds)
+
+
+def devig(red_odds, blue_odds):
+    # Vig-free probabilities of both corners and the bookmaker's margin (overround - 1)
+    red = implied_probability(red_odds)
+    blue = implied_probability(blue_odds)
+    total = red + blue
+    return red / total, blue / total, total - 1
@@ -0,0 +1,120 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+from columnar_store import read_table
+from date_ingest import parse_dates
+
+
+'''
+Win probabilities for every pairing on a roster.
+
+Entry (i, j) of the matchup matrix is the expected score of fighter i against fighter j,
+1 / (1 + 10 ** ((r_j - r_i) / 400)), computed for a whole block at once by broadcasting
+a column of ratings against a row. Large rosters are handled in square tiles, so only
+one tile_size x tile_size block is in memory at a time, and write_matrix streams the
+tiles into a .npy file that can be memory-mapped later.
+
+    python matchup_matrix.py elo_scores_with_finish_multiplier_decay.csv --active-since 2020-01-01 --top 20
+'''
+
+
+def roster_frame(df, weight_classes=None):
+    # Latest rating and fight date of every fighter in a rating output, highest rated first.
+    # weight_classes maps fighter names to their division when filtering by weight class.
+    # Rating outputs list the latest bouts first, so bouts were rated in reverse row order
+    rated_order = np.arange(len(df))[::-1]
+    fights = pd.DataFrame({
+        'fighter': np.concatenate([df['red fighter'].to_numpy(dtype=object), df['blue fighter'].to_numpy(dtype=object)]),
+        'rating': np.concatenate([df['red fighter new elo'].to_numpy(), df['blue fighter new elo'].to_numpy()]),
+        'date': np.concatenate([parse_dates(df['date']).to_numpy()] * 2),
+        'order': np.concatenate([rated_order, rated_order]),
+    })
+    latest = fights.sort_values(['date', 'order']).drop_duplicates('fighter', keep='last').drop(columns='order')
+    roster = latest.rename(columns={'date': 'last_fight'}).sort_values('rating', ascending=False, kind='stable')
+    if weight_classes is not None:
+        roster['weight_class'] = roster['fighter'].map(weight_classes)
+    return roster.reset_index(drop=True)
+
+
+def filter_roster(roster, weight_class=None, active_since=None):
+    # Fighters in a division and/or with a fight on or after active_since
+    mask = np.ones(len(roster), dtype=bool)
+    if weight_class is not None:
+        mask &= (roster['weight_class'] == weight_class).to_numpy()
+    if active_since is not None:
+        mask &= (roster['last_fight'] >= parse_dates(pd.Series([active_since]))[0]).to_numpy()
+    return roster[mask].reset_index(drop=True)
+
+
+def expected_score_matrix(ratings, opponents=None, dtype=np.float32):
+    # Expected score of every rating against every opponent rating (ratings against each other by default)
+    ratings = np.asarray(ratings, dtype=dtype)
+    opponents = ratings if opponents is None else np.asarray(opponents, dtype=dtype)
+    return 1 / (1 + dtype(10) ** ((opponents[np.newaxis, :] - ratings[:, np.newaxis]) / dtype(400)))
+
+
+def matchup_tiles(ratings, tile_size=4096, dtype=np.float32, upper=False):
+    # (row start, column start, block) for each tile of the matchup matrix in row-major order.
+    # With upper only tiles touching the part above the diagonal are produced
+    ratings = np.asarray(ratings, dtype=dtype)
+    n = len(ratings)
+    for row in range(0, n, tile_size):
+        for column in range(row if upper else 0, n, tile_size):
+            yield row, column, expected_score_matrix(ratings[row:row + tile_size], ratings[column:column + tile_size], dtype)
+
+
+def write_matrix(ratings, matrix_file, tile_size=4096, dtype=np.float32):
+    # Full matchup matrix in a .npy file, filled one tile at a time
+    n = len(ratings)
+    matrix = np.lib.format.open_memmap(matrix_file, mode='w+', dtype=dtype, shape=(n, n))
+    for row, column, block in matchup_tiles(ratings, tile_size, dtype):
+        matrix[row:row + block.shape[0], column:column + block.shape[1]] = block
+    matrix.flush()
+    return matrix
+
+
+def most_competitive(ratings, k=10, tile_size=4096, dtype=np.float32):
+    # The k pairings with a win probability closest to a coin flip, scanning the upper
+    # triangle of the matrix tile by tile and keeping the best k seen so far.
+    # Returns (first, second, probability) arrays, most competitive first
+    best = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=dtype)
+    for row, column, block in matchup_tiles(ratings, tile_size, dtype, upper=True):
+        distance = np.abs(block - dtype(0.5))
+        if row == column:
+            # Diagonal tiles hold each pairing twice and every fighter against themselves
+            distance[np.tril_indices(len(distance), 0, distance.shape[1])] = np.inf
+        distance = distance.ravel()
+        keep = np.argpartition(distance, k)[:k] if len(distance) > k else np.arange(len(distance))
+        keep = keep[np.isfinite(distance[keep])]
+        first, second = np.divmod(keep, block.shape[1])
+        best = tuple(np.concatenate(values) for values in
+                     zip(best, (first + row, second + column, block.ravel()[keep])))
+        if len(best[2]) > k:
+            keep = np.argpartition(np.abs(best[2] - dtype(0.5)), k)[:k]
+            best = tuple(values[keep] for values in best)
+    order = np.lexsort((best[1], best[0], np.abs(best[2] - dtype(0.5))))
+    return tuple(values[order] for values in best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Win probabilities for every pairing on a roster')
+    parser.add_argument('ratings_file', help='rating output (CSV or .cols store)')
+    parser.add_argument('--active-since', help='only fighters with a bout on or after this date')
+    parser.add_argument('--top', type=int, default=10, help='print the most competitive pairings')
+    parser.add_argument('--matrix-file', help='also write the full matrix to this .npy file')
+    parser.add_argument('--tile-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    roster = filter_roster(roster_frame(read_table(args.ratings_file)), active_since=args.active_since)
+    ratings = roster['rating'].to_numpy()
+    if args.matrix_file:
+        write_matrix(ratings, args.matrix_file, args.tile_size)
+        print(f'{len(roster)} x {len(roster)} matchup matrix saved to {args.matrix_file}')
+    fighters = roster['fighter'].to_numpy()
+    for first, second, probability in zip(*most_competitive(ratings, args.top, args.tile_size)):
+        print(f'{fighters[first]} vs {fighters[second]}: {probability:.3f}')
+
+
+if __name__ == '__main__':
+    main()
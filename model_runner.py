@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import bradley_terry_finish
+import elo_finish_decay
+import elo_finish_k_factor
+import elo_finish_market
+import elo_finish_simple
+import glicko_finish
+from bradley_terry import bradley_terry_replay
+from elo_engine import (Replay, attach_bouts, load_bouts, market_probabilities, model_replay, multiplier_table,
+                        prepare_bouts, rate_models, rating_frame, replay, share_bouts, write_rating_frame)
+from glicko_engine import glicko_replay
+from instrumentation import stage
+from prediction_report import model_name
+
+
+'''
+Every rating model from one load of the cleaned data.
+
+    python model_runner.py cleaned_ufc_data_with_finish.csv --output-dir ratings
+    python model_runner.py cleaned_ufc_data_with_finish.csv --models simple decay glicko --mode pool
+    python model_runner.py cleaned_ufc_data_with_finish.csv --snapshot elo_state_all.npz --analyze
+
+The bouts are read, date-parsed and interned once. In the default fused mode the Elo
+variants are replayed together in one pass of elo_engine.replay_models, which shares the
+per-bout work and keeps a column of ratings per model, so refreshing all of them costs
+little more than refreshing one. The Glicko-2 and Bradley-Terry models then run in the same
+process. In pool mode every model is a task on a process pool, with the bout arrays in
+shared memory.
+
+Each model's parameters come from its script, so a retuned script and the runner never
+disagree. run_models returns the rating frames keyed by the model names the output files
+give in the reports, and prediction_report.load_predictions (so betting_compare,
+incorrect_predictions and odds_backtest) and comparative_analysis_finish.frame_metrics take
+them as they are, without writing and reading the files back. With a snapshot the fused
+Elo variants only replay the bouts after the previous run, and their frames and outputs
+then hold just those bouts, like the scripts' snapshot runs.
+'''
+
+
+# Elo variants, replayed together in fused mode
+EloModel = namedtuple('EloModel', ['output_file', 'multiplier_dict', 'replay_options'])
+
+ELO_MODELS = {
+    'simple': EloModel('elo_scores_with_finish_multiplier_simple.csv', elo_finish_simple.multiplier_dict,
+                       {'k_factors': (32, 32, 32)}),
+    'k_factor': EloModel('elo_scores_with_finish_multiplier_k.csv', elo_finish_k_factor.multiplier_dict,
+                         {'k_factors': elo_finish_k_factor.k_factors}),
+    'decay': EloModel('elo_scores_with_finish_multiplier_decay.csv', elo_finish_decay.multiplier_dict,
+                      {'k_factors': elo_finish_decay.k_factors, 'fight_offset': 1,
+                       'decay': (elo_finish_decay.decay_factor_per_day, elo_finish_decay.cap)}),
+    'market': EloModel('elo_scores_with_finish_multiplier_market.csv', elo_finish_market.multiplier_dict,
+                       {'k_factors': elo_finish_market.k_factors, 'fight_offset': 1,
+                        'decay': (elo_finish_market.decay_factor_per_day, elo_finish_market.cap),
+                        'market_weight': elo_finish_market.market_weight}),
+}
+
+
+def _glicko(bouts, market):
+    return glicko_replay(bouts, tau=glicko_finish.tau, initial_deviation=glicko_finish.initial_deviation,
+                         initial_volatility=glicko_finish.initial_volatility)
+
+
+def _bradley_terry(bouts, market):
+    return bradley_terry_replay(bouts, half_life=bradley_terry_finish.half_life, prior=bradley_terry_finish.prior)
+
+
+# Models with their own engines: output file and a function of the Bouts and market probabilities
+OTHER_MODELS = {
+    'glicko': ('elo_scores_glicko.csv', _glicko),
+    'bradley_terry': ('elo_scores_bradley_terry.csv', _bradley_terry),
+}
+
+MODELS = list(ELO_MODELS) + list(OTHER_MODELS)
+
+
+def output_file(model):
+    return ELO_MODELS[model].output_file if model in ELO_MODELS else OTHER_MODELS[model][0]
+
+
+def _run_model(model, bouts, market):
+    # One model's per-bout ratings, the same for either mode
+    if model in ELO_MODELS:
+        multiplier_dict, replay_options = ELO_MODELS[model][1:]
+        result = replay(bouts, multiplier_table(bouts, multiplier_dict), market=market, **replay_options)
+    else:
+        result = OTHER_MODELS[model][1](bouts, market)
+    return Replay(result.red_initial, result.blue_initial, result.red_new, result.blue_new, None, None, None)
+
+
+def _pool_task(spec, model, market):
+    shm, bouts, _ = attach_bouts(spec)
+    try:
+        return _run_model(model, bouts, market)
+    finally:
+        del bouts
+        shm.close()
+
+
+def run_models(input_file, models=None, mode='fused', workers=None, snapshot_file=None):
+    # Rating frame of every model, keyed by model name, and whether each was a full recompute.
+    # mode 'fused' replays the Elo variants in one pass, 'pool' runs every model in its own process
+    models = list(models or MODELS)
+    unknown = [model for model in models if model not in ELO_MODELS and model not in OTHER_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown models: {', '.join(unknown)}")
+    if snapshot_file is not None and mode != 'fused':
+        raise ValueError('Snapshots are only kept in fused mode')
+
+    df = load_bouts(input_file)
+    results, full = {}, {}
+    with stage('runner.models', rows=len(df), iterations=len(models)):
+        if mode == 'fused':
+            elo = [model for model in models if model in ELO_MODELS]
+            if elo:
+                elo_df, bouts, result, elo_full = rate_models(df, [ELO_MODELS[model][1:] for model in elo], snapshot_file)
+                for i, model in enumerate(elo):
+                    results[model] = (elo_df, model_replay(result, i))
+                    full[model] = elo_full
+            others = [model for model in models if model not in ELO_MODELS]
+            if others:
+                bouts = prepare_bouts(df)
+                market = market_probabilities(df)
+                for model in others:
+                    results[model] = (df, _run_model(model, bouts, market))
+                    full[model] = True
+        elif mode == 'pool':
+            bouts = prepare_bouts(df)
+            market = market_probabilities(df)
+            shm, spec = share_bouts(bouts)
+            try:
+                with ProcessPoolExecutor(workers or min(len(models), os.cpu_count())) as pool:
+                    tasks = {model: pool.submit(_pool_task, spec, model, market) for model in models}
+                    for model, task in tasks.items():
+                        results[model] = (df, task.result())
+                        full[model] = True
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            raise ValueError(f'Unknown mode: {mode}')
+
+    names = {model: model_name(output_file(model)) for model in models}
+    frames = {names[model]: rating_frame(*results[model]) for model in models}
+    return frames, {names[model]: full[model] for model in models}
+
+
+def write_outputs(frames, full, output_dir='.'):
+    # Each frame to its model's usual output file, appended after a snapshot run
+    os.makedirs(output_dir, exist_ok=True)
+    for model, frame in frames.items():
+        path = os.path.join(output_dir, model + '.csv')
+        write_rating_frame(frame, path, append=not full[model])
+        print(f'{model} written to {path}')
+
+
+def analyze(frames, output_dir='.'):
+    # The prediction reports and model metrics straight from the frames in memory
+    from betting_compare import filter_predictions
+    from comparative_analysis_finish import frame_metrics  # Pulls in sklearn
+
+    filter_predictions(frames, os.path.join(output_dir, 'correct_elo_wrong_odds.csv'),
+                       os.path.join(output_dir, 'correct_odds_wrong_elo.csv'),
+                       os.path.join(output_dir, 'model_disagreements.csv'))
+    metrics_file = os.path.join(output_dir, 'model_metrics.json')
+    with open(metrics_file, 'w') as f:
+        json.dump({'files': None, 'models': frame_metrics(frames)}, f)
+    print(f'Model metrics written to {metrics_file}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every rating model from one load of the cleaned data')
+    parser.add_argument('input_file')
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    parser.add_argument('--mode', choices=['fused', 'pool'], default='fused')
+    parser.add_argument('--workers', type=int, help='processes in pool mode, one per model by default')
+    parser.add_argument('--snapshot', help='state file so later fused runs only rate new bouts')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--analyze', action='store_true', help='also write the prediction reports and model metrics')
+    args = parser.parse_args()
+
+    frames, full = run_models(args.input_file, args.models, args.mode, args.workers, args.snapshot)
+    write_outputs(frames, full, args.output_dir)
+    if args.analyze:
+        analyze(frames, args.output_dir)
+
+
+if __name__ == '__main__':
+    main()
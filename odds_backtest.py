@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from columnar_store import is_column_store, write_table
+from market_odds import decimal_odds, devig
+from prediction_report import BOUT_KEY, load_predictions
+from walk_forward import expected_score
+
+
+'''
+Flat-stake betting backtest of every model against the market, over the full history.
+
+For every bout of every rating output the model's forecast (the red corner's expected
+score from the initial ratings) is set against the market's vig-free probability. The
+edge is the difference between the two, the expected value of a one unit bet on a side
+is forecast * decimal odds - 1 at the price actually offered, so the vig counts against
+it. A model bets one unit on the side with the higher expected value whenever that is
+above the threshold, and is paid at the quoted odds.
+
+All the models and thresholds are scored in one pass: the bets are a (rows x thresholds)
+mask and the per-model totals are bincounts over model and threshold. Only bouts with a
+winner and valid odds for both corners count, and with rated_only those where neither
+fighter was on the starting rating.
+
+The rating outputs carry the odds when the cleaned data does, outputs from data cleaned
+before the odds were kept cannot be backtested.
+'''
+
+
+# Minimum expected value per unit staked for a bet
+EV_THRESHOLDS = [0.0, 0.02, 0.05, 0.1]
+
+ODDS_REQUIRED = ['red odds', 'blue odds']
+
+
+def bout_bets(df):
+    # Forecast, market probability, edge and the better side's expected value and profit per row
+    red_odds = df['red odds'].to_numpy(dtype=np.float64)
+    blue_odds = df['blue odds'].to_numpy(dtype=np.float64)
+    red_market, _, margin = devig(red_odds, blue_odds)
+    forecast = expected_score(df['red fighter initial elo'].to_numpy(), df['blue fighter initial elo'].to_numpy())
+
+    red_price = decimal_odds(red_odds)
+    blue_price = decimal_odds(blue_odds)
+    red_ev = forecast * red_price - 1
+    blue_ev = (1 - forecast) * blue_price - 1
+    bet_red = red_ev >= blue_ev
+    winner = df['winner'].to_numpy(dtype=object)
+    won = np.where(bet_red, winner == 'Red', winner == 'Blue')
+    price = np.where(bet_red, red_price, blue_price)
+
+    return pd.DataFrame({
+        'model': df['model'].to_numpy(),
+        **{column: df[column].to_numpy() for column in BOUT_KEY},
+        'winner': winner,
+        'forecast': forecast,
+        'market': red_market,
+        'margin': margin,
+        'edge': forecast - red_market,
+        'bet': np.where(bet_red, 'Red', 'Blue').astype(object),
+        'price': price,
+        'ev': np.where(bet_red, red_ev, blue_ev),
+        'profit': np.where(won, price - 1, -1.0),
+    })
+
+
+def backtest_summary(bets, thresholds=EV_THRESHOLDS):
+    # ROI, hit rate and edge of every model at every threshold, plus how its forecasts scored
+    # against the market's on the same bouts
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    codes, models = pd.factorize(bets['model'])
+    n_models, n_thresholds = len(models), len(thresholds)
+    red_won = (bets['winner'] == 'Red').to_numpy()
+
+    def per_model(values):
+        return np.bincount(codes, weights=values, minlength=n_models)
+
+    bouts = per_model(None)
+    summary = pd.DataFrame({
+        'model': np.repeat(np.asarray(models, dtype=object), n_thresholds),
+        'min ev': np.tile(thresholds, n_models),
+        'bouts': np.repeat(bouts, n_thresholds).astype(np.int64),
+        'mean edge': np.repeat(per_model(np.abs(bets['edge'].to_numpy())) / bouts, n_thresholds),
+        'model brier': np.repeat(per_model((bets['forecast'].to_numpy() - red_won) ** 2) / bouts, n_thresholds),
+        'market brier': np.repeat(per_model((bets['market'].to_numpy() - red_won) ** 2) / bouts, n_thresholds),
+    })
+
+    # Bets at every threshold, summed per (model, threshold) cell
+    placed = bets['ev'].to_numpy()[:, None] >= thresholds[None, :]
+    rows, columns = np.nonzero(placed)
+    cell = codes[rows] * n_thresholds + columns
+    size = n_models * n_thresholds
+    count = np.bincount(cell, minlength=size)
+    wins = np.bincount(cell, weights=(bets['profit'].to_numpy() > 0)[rows], minlength=size)
+    profit = np.bincount(cell, weights=bets['profit'].to_numpy()[rows], minlength=size)
+    ev = np.bincount(cell, weights=bets['ev'].to_numpy()[rows], minlength=size)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary['bets'] = count
+        summary['hit rate'] = wins / count
+        summary['profit'] = profit
+        summary['roi'] = profit / count
+        summary['mean ev'] = ev / count
+    return summary
+
+
+def odds_backtest(csv_files, summary_file, bets_file=None, thresholds=EV_THRESHOLDS, rated_only=True):
+    df = load_predictions(csv_files)
+    missing = [column for column in ODDS_REQUIRED if column not in df]
+    if missing:
+        raise ValueError('The rating outputs have no odds columns, re-run the cleaner and the rating scripts first')
+
+    bets = bout_bets(df)
+    scored = bets['winner'].isin(['Red', 'Blue']).to_numpy() & ~np.isnan(bets['market'].to_numpy())
+    if rated_only:
+        scored &= df['rated'].to_numpy()
+    bets = bets[scored]
+
+    summary = backtest_summary(bets, thresholds)
+    summary.to_csv(summary_file, index=False)
+    print(f"Backtest of {len(bets)} model forecasts against the market written to {summary_file}")
+    if bets_file is not None:
+        # A .cols path is much faster to write than a CSV of a few hundred thousand floats
+        if is_column_store(bets_file):
+            write_table(bets, bets_file)
+        else:
+            bets.to_csv(bets_file, index=False)
+        print(f"Edge and outcome of every bet written to {bets_file}")
+    return summary
+
+
+if __name__ == "__main__":
+    # List of your CSV files
+    csv_files = [
+        '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_decay.csv',
+        '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_k.csv',
+        '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_simple.csv',
+        '/Users/richie/Documents/git_hub/elo_project/ufc/elo_scores_with_finish_multiplier_market.csv',
+    ]
+
+    summary_file = 'odds_backtest.csv'
+    bets_file = None  # e.g. 'odds_backtest_bets.cols' for the edge and outcome of every bet
+
+    summary = odds_backtest(csv_files, summary_file, bets_file)
+    print(summary.to_string(index=False))
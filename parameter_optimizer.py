@@ -1,8 +1,15 @@
+import os
 import pandas as pd
-from datetime import datetime
-from sklearn.metrics import accuracy_score, roc_curve, auc
+from multiprocessing import Pool
 import numpy as np
-from tqdm import tqdm
+from elo_engine import (RED, BLUE, load_bouts, prepare_bouts, multiplier_table, fight_history, replay, replay_sweep,
+                        head_bouts, share_bouts, attach_bouts)
+from search_strategies import strategies
+from replay_cache import CheckpointCache
+from walk_forward import walk_forward
+from glicko_engine import glicko_replay
+from resampling import bootstrap, bout_outcomes
+from instrumentation import stage
 
 
 '''
@@ -14,104 +21,72 @@ The best accuracy is: 67.5857843137255, with parameters: {'best decay rate': 0.9
 '''
 
 
-def parse_date(date_str):
-    if not isinstance(date_str, str):
-        return date_str  # If it's already a datetime object, just return it as is
-    
-    for fmt in ('%m/%d/%Y', '%Y-%m-%d'):
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-    raise ValueError('No valid date format found for ' + str(date_str))
-
-
-def dynamic_k_factor(total_fights, k1, k2, k3):
-    if total_fights < 3:
-        return k1
-    elif total_fights < 5:
-        return k2
-    else:
-        return k3
-
-def update_elo(winner_elo, loser_elo, winner_fights, loser_fights, elo_decay_factor, win_type, sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3):
+def engine_parameters(sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3):
+    # The sweep has always handed the K factors to update_elo in the multiplier slots and the
+    # multipliers in the K slots, and scored every bout with the red corner as the winner.
+    # Keep that mapping so accuracies stay comparable with the results recorded above.
     multiplier_dict = {
-        'submission': sub,
-        'knockout': ko,
-        'decision': sdec,
-        'unanimous decision': udec,
-        'dq': dq,
-        'other': other,
-        'unknown': unknown
+        'submission': k1,
+        'knockout': k2,
+        'decision': k3,
+        'unanimous decision': sub,
+        'dq': ko,
+        'other': sdec,
+        'unknown': udec
     }
-    
-    multiplier = multiplier_dict.get(win_type, 1.0)
-    
-    k_winner = dynamic_k_factor(winner_fights, k1, k2, k3) * multiplier
-    k_loser = dynamic_k_factor(loser_fights, k1, k2, k3) * multiplier
-    
-    winner_elo -= elo_decay_factor
-    loser_elo -= elo_decay_factor
-
-    expected_winner = 1 / (1 + 10 ** ((loser_elo - winner_elo) / 400))
-    expected_loser = 1 / (1 + 10 ** ((winner_elo - loser_elo) / 400))
-    
-    new_winner_elo = round(winner_elo + k_winner * (1 - expected_winner))
-    new_loser_elo = round(loser_elo - k_loser * expected_loser)
-
-    return new_winner_elo, new_loser_elo
+    return multiplier_dict, (dq, other, unknown)
 
 
 def calculate_elo(df, decay_rate, decay_cap, sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3):
-    df['date'] = df['date'].apply(parse_date)
-    df = df.sort_values(by='date')
-    elo_scores = {}
-    fight_counts = {}
-    last_fight_dates = {}
-
-    # Initialize ELO scores and fight counts for all fighters
-    for fighter in pd.concat([df['R_fighter'], df['B_fighter']]).unique():
-        elo_scores[fighter] = 1000  # Default ELO score
-        fight_counts[fighter] = 0   # Default fight count
-
-    for index, row in df.iterrows():
-        r_fighter, b_fighter, date, winner, win_type = row['R_fighter'], row['B_fighter'], row['date'], row['Winner'], row['win_type']
-        
-        r_elo = elo_scores[r_fighter]
-        b_elo = elo_scores[b_fighter]
-        r_fights = fight_counts[r_fighter]
-        b_fights = fight_counts[b_fighter]
-
-        current_date = date
-        r_inactive_days, b_inactive_days = 0, 0
-        
-        if r_fighter in last_fight_dates:
-            r_inactive_days = (current_date - last_fight_dates[r_fighter]).days
-        if b_fighter in last_fight_dates:
-            b_inactive_days = (current_date - last_fight_dates[b_fighter]).days
-        
-        r_elo_decay = min(decay_rate * r_inactive_days, decay_cap)
-        b_elo_decay = min(decay_rate * b_inactive_days, decay_cap)
-
-        r_elo, b_elo = update_elo(r_elo, b_elo, r_fights, b_fights, r_elo_decay, win_type, k1, k2, k3, sub, ko, sdec, udec, dq, other, unknown)
-
-        fight_counts[r_fighter] += 1
-        fight_counts[b_fighter] += 1
-        last_fight_dates[r_fighter] = current_date
-        last_fight_dates[b_fighter] = current_date
-
-        elo_scores[r_fighter] = r_elo
-        elo_scores[b_fighter] = b_elo
+    df = load_bouts(df)
+    bouts = prepare_bouts(df)
+
+    multiplier_dict, k_factors = engine_parameters(sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3)
+    result = replay(bouts, multiplier_table(bouts, multiplier_dict), k_factors=k_factors,
+                    decay=(decay_rate, decay_cap), winner=np.full(len(df), RED))
 
     # Calculate 'elo_diff' and 'predicted_outcome' for each match
-    df['elo_diff'] = df.apply(lambda row: elo_scores[row['R_fighter']] - elo_scores[row['B_fighter']], axis=1)
-    df['predicted_outcome'] = df['elo_diff'].apply(lambda x: 'Red' if x > 0 else 'Blue')
+    elo_diff = result.ratings[bouts.red] - result.ratings[bouts.blue]
+    df['elo_diff'] = elo_diff
+    df['predicted_outcome'] = np.where(elo_diff > 0, 'Red', 'Blue')
 
     return df
 
 
+def calculate_walk_forward(df, decay_rate, decay_cap, sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3):
+    # calculate_elo scores every bout from the final ratings, i.e. with hindsight. This replays
+    # the bouts with their real winners and scores each one from the ratings going into it,
+    # returning the season by season report from walk_forward
+    df = load_bouts(df)
+    bouts = prepare_bouts(df)
+
+    multiplier_dict, k_factors = engine_parameters(sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3)
+    _, report = walk_forward(bouts, multiplier_table(bouts, multiplier_dict), k_factors=k_factors,
+                             decay=(decay_rate, decay_cap))
+    return report
+
+
+def calculate_ratings_batch(bouts, decay_rate, decay_cap, sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3, history=None):
+    # Final ratings (fighters x parameter sets) of the sweep's replay, every parameter can be
+    # an array with one entry per parameter set
+    multiplier_dict, k_factors = engine_parameters(sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3)
+    return replay_sweep(bouts, multiplier_table(bouts, multiplier_dict), k_factors,
+                        decay=(decay_rate, decay_cap), winner=np.full(len(bouts.red), RED), history=history)
+
+
+def calculate_accuracy_batch(bouts, decay_rate, decay_cap, sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3, history=None):
+    # Batch version of calculate_elo + calculate_accuracy_by_elo_diff: every parameter can be
+    # an array with one entry per parameter set, and the bouts are replayed once for all of them
+    sets = np.broadcast(decay_rate, decay_cap, sub, ko, sdec, udec, dq, other, unknown, k1, k2, k3).size
+    with stage('optimize.evaluate', rows=len(bouts.red) * sets, iterations=sets):
+        ratings = calculate_ratings_batch(bouts, decay_rate, decay_cap, sub, ko, sdec, udec, dq, other, unknown,
+                                          k1, k2, k3, history=history)
+        return accuracy_from_ratings(bouts, ratings)
+
 
 def calculate_accuracy_by_elo_diff(df):
+    from sklearn.metrics import accuracy_score  # Slow to import and only needed here
+
     if not df.empty:
         overall_accuracy = accuracy_score(df['Winner'], df['predicted_outcome']) * 100
     else:
@@ -119,52 +94,211 @@ def calculate_accuracy_by_elo_diff(df):
     return overall_accuracy
 
 
-input_file = '/Users/richie/Documents/git_hub/elo_project/ufc/cleaned_ufc_data_with_finish.csv'  
-output_file = 'elo_scores_with_finish_multiplier_decay.csv'
-best_accuracy = 0
-best_parameters = {}
-total_iterations = (
-    len(np.arange(-0.2,1.0,0.1))* 
-    len(np.arange(-101,301,50))*
-    len(np.arange(1.0,2.0,0.2))* 
-    len(np.arange(1.0,2.0,0.2))* 
-    len(np.arange(1.0,2.0,0.5))*
-    len(np.arange(301,601,50))* 
-    len(np.arange(101,301,50))
-)
-# Load the DataFrame
-df_initial = pd.read_csv(input_file)
-df_initial['date'] = df_initial['date'].apply(parse_date)
-df_initial = df_initial.sort_values(by='date')
-print(total_iterations)
-with tqdm(total=total_iterations) as pbar:
-    for decay_rate in np.arange(-0.2,1.0,0.1):
-        for decay_cap in np.arange(-101,301,50):
-            for sub in np.arange(1.0,2.0,0.2):
-                for udec in np.arange(1.0,2.0,0.2):
-                        for other in np.arange(1.0,1.5,0.5):
-                            for k1 in np.arange(301,601,50):
-                                for k2 in np.arange(101,301,50):
-                                    # Create a copy of the initial DataFrame for each iteration
-                                    df_iter = df_initial.copy()
-                                    updated_df = calculate_elo(df_iter, decay_rate, decay_cap, sub, sub, 1, udec, other, other, other, k1, k2, 1)
-                                    # Calculate accuracy for the current parameter set
-                                    accuracy = calculate_accuracy_by_elo_diff(updated_df)
-                                    if accuracy >= best_accuracy:
-                                        best_accuracy = accuracy
-                                        best_parameters = {
-                                            'best decay rate' : decay_rate,
-                                            'best decay cap' : decay_cap,
-                                            'best sub' : sub,
-                                            'best ko' : sub,
-                                            'best sdec' : 1,
-                                            'best udec' : udec,
-                                            'best dq' : other,
-                                            'best other' : other,
-                                            'best unknown' : other,
-                                            'best k1' : k1,
-                                            'best k2' : k2,
-                                            'best k3' : 1 
-                                        }
-                                    pbar.update(1)
-print(f'The best accuracy is: {best_accuracy}, with parameters: {best_parameters}.')
+def accuracy_from_ratings(bouts, ratings):
+    # Accuracy of predicting each bout from the final ratings, ratings holds one rating
+    # per fighter or a (fighters x parameter sets) matrix
+    elo_diff = ratings[bouts.red] - ratings[bouts.blue]
+    shape = (-1,) + (1,) * (elo_diff.ndim - 1)
+    correct = np.where(elo_diff > 0, (bouts.winner == RED).reshape(shape), (bouts.winner == BLUE).reshape(shape))
+    return correct.mean(axis=0) * 100
+
+
+def grid_parameters(axes, index):
+    # Parameter values at flat positions of the Cartesian grid, in the order of nested loops over the axes
+    shape = tuple(len(axis) for axis in axes)
+    return [axis[i] for axis, i in zip(axes, np.unravel_index(index, shape))]
+
+
+def calculate_accuracy_grid(bouts, axes, index, history=None):
+    # Accuracy for grid positions over the (decay rate, decay cap, sub, udec, other, k1, k2) axes
+    decay_rates, decay_caps, subs, udecs, others, k1s, k2s = grid_parameters(axes, index)
+    return calculate_accuracy_batch(bouts, decay_rates, decay_caps, subs, subs, 1, udecs,
+                                    others, others, others, k1s, k2s, 1, history=history)
+
+
+def search_objective(bouts, history=None, cache=None):
+    # Objective for search_strategies over the grid's parameters, scoring any values in between grid points.
+    # With a CheckpointCache candidates are replayed one at a time, resuming from shared prefixes
+    if history is None:
+        history = fight_history(bouts)
+
+    def objective(parameters, fraction=None):
+        sample, sample_history = bouts, history
+        if fraction is not None:
+            sample, sample_history = head_bouts(bouts, max(1, int(len(bouts.red) * fraction)), history)
+        p = parameters
+        if cache is None:
+            return calculate_accuracy_batch(sample, p['decay_rate'], p['decay_cap'], p['sub'], p['sub'], 1, p['udec'],
+                                            p['other'], p['other'], p['other'], p['k1'], p['k2'], 1, history=sample_history)
+
+        accuracies = []
+        for i in range(len(p['k1'])):
+            multiplier_dict, k_factors = engine_parameters(p['sub'][i], p['sub'][i], 1, p['udec'][i], p['other'][i],
+                                                           p['other'][i], p['other'][i], p['k1'][i], p['k2'][i], 1)
+            state = cache.replay(multiplier_table(bouts, multiplier_dict), k_factors,
+                                 decay=(p['decay_rate'][i], p['decay_cap'][i]), stop=len(sample.red))
+            accuracies.append(accuracy_from_ratings(sample, state.ratings))
+        return np.array(accuracies)
+    return objective
+
+
+# Glicko-2 parameters searched by glicko_objective, as (low, high, type)
+GLICKO_SPACE = {
+    'tau': (0.2, 1.2, float),
+    'initial_deviation': (50, 350, float),
+    'initial_volatility': (0.01, 0.2, float),
+}
+
+
+def glicko_objective(bouts):
+    # Objective for search_strategies over GLICKO_SPACE, scored from the final ratings like the Elo sweep
+    # but with the real winners, since the Glicko-2 engine has no results to stay comparable with
+    def objective(parameters, fraction=None):
+        sample = bouts
+        if fraction is not None:
+            sample = head_bouts(bouts, max(1, int(len(bouts.red) * fraction)))
+        candidates = zip(parameters['tau'], parameters['initial_deviation'], parameters['initial_volatility'])
+        return np.array([accuracy_from_ratings(sample, glicko_replay(sample, tau, deviation, volatility).ratings)
+                         for tau, deviation, volatility in candidates])
+    return objective
+
+
+# State of a process pool worker, set up once by _init_worker
+_worker = {}
+
+def _init_worker(spec, axes):
+    shm, bouts, history = attach_bouts(spec)
+    _worker.update(shm=shm, bouts=bouts, history=history, axes=axes)
+
+def _evaluate_shard(shard):
+    start, stop = shard
+    accuracies = calculate_accuracy_grid(_worker['bouts'], _worker['axes'], np.arange(start, stop), _worker['history'])
+    return start, accuracies
+
+
+def sharded_sweep(bouts, axes, workers=None, shard_size=1024, history=None):
+    # Split the grid into shards of consecutive positions and score them on a process pool.
+    # The bout arrays reach the workers through shared memory, only shard bounds are sent per task.
+    # Returns the accuracy of every grid position in grid order
+    from tqdm import tqdm  # Only the sweep shows progress
+
+    if history is None:
+        history = fight_history(bouts)
+    total = int(np.prod([len(axis) for axis in axes]))
+    shards = [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+    accuracies = np.empty(total)
+
+    with tqdm(total=total) as pbar, stage('optimize.sweep', rows=len(bouts.red) * total, iterations=total):
+        if workers == 1:
+            for start, stop in shards:
+                accuracies[start:stop] = calculate_accuracy_grid(bouts, axes, np.arange(start, stop), history)
+                pbar.update(stop - start)
+            return accuracies
+
+        shm, spec = share_bouts(bouts, history)
+        try:
+            with Pool(workers, initializer=_init_worker, initargs=(spec, axes)) as pool:
+                # Progress covers every worker since each finished shard reports back here
+                for start, shard_accuracies in pool.imap_unordered(_evaluate_shard, shards):
+                    accuracies[start:start + len(shard_accuracies)] = shard_accuracies
+                    pbar.update(len(shard_accuracies))
+        finally:
+            shm.close()
+            shm.unlink()
+    return accuracies
+
+
+# Grid axes, swept in the order of the original nested loops
+GRID_AXES = [
+    np.arange(-0.2,1.0,0.1),    # decay rate
+    np.arange(-101,301,50),     # decay cap
+    np.arange(1.0,2.0,0.2),     # sub
+    np.arange(1.0,2.0,0.2),     # udec
+    np.arange(1.0,1.5,0.5),     # other
+    np.arange(301,601,50),      # k1
+    np.arange(101,301,50),      # k2
+]
+
+
+def optimize(input_file, axes=GRID_AXES, strategy='grid', budget=300, workers=None, shard_size=1024, use_cache=False,
+             show_walk_forward=True, show_intervals=20, n_resamples=10000, model='elo'):
+    # Search the parameters on the cleaned data and print the best ones, returns (best accuracy, best parameters).
+    # strategy 'grid' sweeps every point of axes, the others spend budget evaluations within the grid's bounds
+    # Load the DataFrame and prepare the bout arrays once for the whole sweep
+    df_initial = load_bouts(input_file)
+    bouts = prepare_bouts(df_initial)
+    if model == 'glicko':
+        result = strategies['random' if strategy == 'grid' else strategy](glicko_objective(bouts), GLICKO_SPACE, budget)
+        print(f'The best accuracy is: {result.best_accuracy}, with parameters: {result.best_parameters}, '
+              f'after {result.evaluations} evaluations.')
+        return result.best_accuracy, result.best_parameters
+
+    if strategy != 'grid':
+        names = ['decay_rate', 'decay_cap', 'sub', 'udec', 'other', 'k1', 'k2']
+        space = {
+            name: (axis.min(), axis.max(), int if np.issubdtype(axis.dtype, np.integer) else float)
+            for name, axis in zip(names, axes)
+        }
+        cache = CheckpointCache(bouts, winner=np.full(len(bouts.red), RED)) if use_cache else None
+        result = strategies[strategy](search_objective(bouts, cache=cache), space, budget)
+        print(f'The best accuracy is: {result.best_accuracy}, with parameters: {result.best_parameters}, '
+              f'after {result.evaluations} evaluations.')
+        if cache is not None:
+            print(f'Replay cache: {cache.stats()}')
+        return result.best_accuracy, result.best_parameters
+
+    total_iterations = int(np.prod([len(axis) for axis in axes]))
+    print(total_iterations)
+    accuracies = sharded_sweep(bouts, axes, workers=workers, shard_size=shard_size)
+
+    # Ties go to the later parameter set, like the old `>=` comparison
+    best = total_iterations - 1 - np.argmax(accuracies[::-1])
+    best_accuracy = accuracies[best]
+    decay_rate, decay_cap, sub, udec, other, k1, k2 = grid_parameters(axes, best)
+    best_parameters = {
+        'best decay rate' : decay_rate,
+        'best decay cap' : decay_cap,
+        'best sub' : sub,
+        'best ko' : sub,
+        'best sdec' : 1,
+        'best udec' : udec,
+        'best dq' : other,
+        'best other' : other,
+        'best unknown' : other,
+        'best k1' : k1,
+        'best k2' : k2,
+        'best k3' : 1 
+    }
+    print(f'The best accuracy is: {best_accuracy}, with parameters: {best_parameters}.')
+
+    if show_intervals:
+        # Resampling the bouts of the best grid points shows which of them only differ by noise
+        top = np.argsort(-accuracies, kind='stable')[:show_intervals]
+        decay_rates, decay_caps, subs, udecs, others, k1s, k2s = grid_parameters(axes, top)
+        ratings = calculate_ratings_batch(bouts, decay_rates, decay_caps, subs, subs, 1, udecs,
+                                          others, others, others, k1s, k2s, 1)
+        intervals = bootstrap(*bout_outcomes(bouts, ratings), n_resamples=n_resamples)
+        parameters = pd.DataFrame(dict(zip(['decay rate', 'decay cap', 'sub/ko', 'udec', 'other', 'k1', 'k2'],
+                                           [decay_rates, decay_caps, subs, udecs, others, k1s, k2s])))
+        print(pd.concat([parameters, intervals], axis=1).to_string(index=False))
+
+    if show_walk_forward:
+        report = calculate_walk_forward(df_initial, decay_rate, decay_cap, sub, sub, 1, udec, other, other, other, k1, k2, 1)
+        print(report.to_string(index=False))
+    return best_accuracy, best_parameters
+
+
+if __name__ == '__main__':
+    input_file = '/Users/richie/Documents/git_hub/elo_project/ufc/cleaned_ufc_data_with_finish.csv'  
+    workers = os.cpu_count()  # Processes used for the sweep, 1 runs it in this process
+    shard_size = 1024  # Parameter sets per task, bounds the (fighters x sets) ratings matrix
+    strategy = 'grid'  # Or one of 'random', 'coordinate', 'halving', 'tpe' to search within the grid's bounds
+    budget = 300  # Evaluations a search strategy may spend
+    use_cache = False  # Resume search candidates from cached replay prefixes and report the hit rate
+    show_walk_forward = True  # Print the leakage-free season by season report for the best parameters
+    show_intervals = 20  # Bootstrap intervals for this many of the best grid points, 0 to skip
+    n_resamples = 10000
+    model = 'elo'  # Or 'glicko' to search the Glicko-2 parameters with strategy ('random' for the grid)
+
+    optimize(input_file, strategy=strategy, budget=budget, workers=workers, shard_size=shard_size, use_cache=use_cache,
+             show_walk_forward=show_walk_forward, show_intervals=show_intervals, n_resamples=n_resamples, model=model)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from columnar_store import read_table
+from date_ingest import parse_dates
+
+
+# Columns that identify a bout across the outputs of different models
+BOUT_KEY = ['red fighter', 'blue fighter', 'date']
+
+# Columns load_predictions adds to the rating outputs
+PREDICTION_COLUMNS = ['model', 'elo_pick', 'elo_correct', 'odds_correct', 'rated']
+
+DEFAULT_ELO = 1000
+
+
+def model_name(path):
+    return str(path).rstrip('/').split('/')[-1].replace('.csv', '').replace('.cols', '')
+
+
+def load_predictions(csv_files):
+    # Every rating output (CSV or column store) in one frame with a 'model' column, the side with
+    # the higher initial Elo, whether it and the betting favorite picked the winner, and whether
+    # both fighters had a rating other than the default going into the bout. csv_files can also map
+    # model names to rating frames already in memory, as model_runner returns them
+    if isinstance(csv_files, dict):
+        frames = [df.assign(model=model) for model, df in csv_files.items()]
+    else:
+        frames = [read_table(csv_file).assign(model=model_name(csv_file)) for csv_file in csv_files]
+    df = pd.concat(frames, ignore_index=True)
+    for column in ['red fighter', 'blue fighter', 'winner', 'win_type', 'favorite']:
+        if column in df:
+            df[column] = df[column].astype(object)
+    df['date'] = parse_dates(df['date'])
+
+    red_elo = df['red fighter initial elo'].to_numpy()
+    blue_elo = df['blue fighter initial elo'].to_numpy()
+    winner = df['winner'].to_numpy(dtype=object)
+    df['elo_pick'] = np.where(red_elo > blue_elo, 'Red', 'Blue').astype(object)
+    df['elo_correct'] = df['elo_pick'].to_numpy() == winner
+    df['odds_correct'] = df['favorite'].to_numpy(dtype=object) == winner
+    df['rated'] = (red_elo != DEFAULT_ELO) & (blue_elo != DEFAULT_ELO)
+    return df
+
+
+def bout_rows(df, mask):
+    # Rows matching mask with the added columns dropped, one per bout (the first model's wins)
+    columns = [column for column in df.columns if column not in PREDICTION_COLUMNS]
+    return df.loc[mask, columns].drop_duplicates(subset=BOUT_KEY)
+
+
+def disagreement_table(df):
+    # One row per bout: the winner, the betting favorite and every model's Elo pick, with
+    # which of them were right and whether the models and the odds agreed
+    picks = df.drop_duplicates(subset=BOUT_KEY + ['model']).pivot(index=BOUT_KEY, columns='model', values='elo_pick')
+    models = list(dict.fromkeys(df['model']))
+    picks = picks[models]
+
+    table = df.drop_duplicates(subset=BOUT_KEY).set_index(BOUT_KEY)[['winner', 'favorite']]
+    table['odds correct'] = table['favorite'] == table['winner']
+    for model in models:
+        pick = picks[model].reindex(table.index)
+        table[f'{model} pick'] = pick
+        table[f'{model} correct'] = (pick == table['winner']).where(pick.notna())
+    model_picks = picks.reindex(table.index)
+    table['models agree'] = ~((model_picks == 'Red').any(axis=1) & (model_picks == 'Blue').any(axis=1))
+    table['elo vs odds'] = model_picks.ne(table['favorite'], axis=0).where(model_picks.notna()).any(axis=1)
+    return table.reset_index()
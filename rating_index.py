@@ -0,0 +1,185 @@
+import argparse
+import json
+import sys
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from columnar_store import read_table
+from date_ingest import day_number, day_numbers
+
+
+'''
+Point-in-time rating lookups without rescanning the rating outputs.
+
+Every fighter's rating history is kept as one sorted timeline of (day, rating after the
+fight) inside a single array ordered by fighter id then day, with a name -> id dict in
+front of it. An as-of query is one binary search, and batches of queries are a single
+vectorized searchsorted over all of them.
+
+    python rating_index.py build elo_scores_with_finish_multiplier_decay.csv ratings_index.npz
+    python rating_index.py query ratings_index.npz "Jon Jones" 2015-01-01
+    python rating_index.py serve ratings_index.npz --port 8000
+
+The server answers GET /rating?fighter=...&date=... and POST /ratings with a JSON list
+of {"fighter": ..., "date": ...} objects.
+'''
+
+
+# Spacing between fighters in the combined (fighter, day) search key
+_KEY_STRIDE = 1 << 32
+
+
+class RatingIndex:
+    def __init__(self, fighters, fighter_ids, days, ratings):
+        # fighter_ids, days and ratings hold one entry per fight, sorted by fighter then day
+        self.fighters = list(fighters)
+        self.ids = {name: i for i, name in enumerate(self.fighters)}
+        self.fighter_ids = np.asarray(fighter_ids, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int64)
+        self.ratings = np.asarray(ratings)
+        self.keys = self.fighter_ids * _KEY_STRIDE + self.days
+        self.starts = np.searchsorted(self.fighter_ids, np.arange(len(self.fighters)))
+
+    @classmethod
+    def from_frame(cls, df):
+        # Build from a rating output (the per-bout CSV or column store the rating scripts write)
+        names = np.concatenate([df['red fighter'].to_numpy(dtype=object), df['blue fighter'].to_numpy(dtype=object)])
+        day = day_numbers(df['date'])
+        days = np.concatenate([day, day])
+        ratings = np.concatenate([df['red fighter new elo'].to_numpy(), df['blue fighter new elo'].to_numpy()])
+        codes, fighters = pd.factorize(names)
+        order = np.lexsort((days, codes))
+        return cls(fighters, codes[order], days[order], ratings[order])
+
+    @classmethod
+    def from_replay(cls, bouts, result):
+        # Build straight from elo_engine.prepare_bouts / replay output
+        codes = np.concatenate([bouts.red, bouts.blue])
+        days = np.concatenate([bouts.day, bouts.day])
+        ratings = np.concatenate([result.red_new, result.blue_new])
+        order = np.lexsort((days, codes))
+        return cls(bouts.fighters, codes[order], days[order], ratings[order])
+
+    @classmethod
+    def load(cls, index_file):
+        with np.load(index_file) as index:
+            return cls(index['fighters'].astype(object), index['fighter_ids'], index['days'], index['ratings'])
+
+    def save(self, index_file):
+        np.savez(index_file, fighters=np.asarray(self.fighters, dtype=str), fighter_ids=self.fighter_ids,
+                 days=self.days, ratings=self.ratings)
+
+    def as_of(self, fighter, on=None, include_day=True):
+        # Rating of a fighter after their last fight on or before the date (or strictly before it
+        # with include_day=False, i.e. going into a fight that day). None before their first fight
+        fighter_id = self.ids.get(fighter)
+        if fighter_id is None:
+            raise KeyError(f'Unknown fighter: {fighter}')
+        start = self.starts[fighter_id]
+        stop = self.starts[fighter_id + 1] if fighter_id + 1 < len(self.starts) else len(self.days)
+        if on is None:
+            return self.ratings[stop - 1].item()
+        day = day_number(on)
+        i = np.searchsorted(self.keys[start:stop], fighter_id * _KEY_STRIDE + day, side='right' if include_day else 'left')
+        return self.ratings[start + i - 1].item() if i > 0 else None
+
+    def as_of_many(self, fighters, dates, include_day=True):
+        # Vectorized as_of for many (fighter, date) pairs: a float array with NaN for
+        # unknown fighters and dates before a fighter's first fight
+        fighter_ids = pd.Series(fighters, dtype=object).map(self.ids).to_numpy(dtype=np.float64)
+        known = ~np.isnan(fighter_ids)
+        fighter_ids = np.where(known, fighter_ids, 0).astype(np.int64)
+        days = day_numbers(pd.Series(dates, dtype=object)).astype(np.int64)
+        i = np.searchsorted(self.keys, fighter_ids * _KEY_STRIDE + days, side='right' if include_day else 'left') - 1
+        found = known & (i >= 0) & (i >= self.starts[fighter_ids])
+        return np.where(found, self.ratings[np.maximum(i, 0)], np.nan)
+
+    def timeline(self, fighter):
+        # Every (date, rating) of a fighter in date order
+        fighter_id = self.ids[fighter]
+        start = self.starts[fighter_id]
+        stop = self.starts[fighter_id + 1] if fighter_id + 1 < len(self.starts) else len(self.days)
+        dates = self.days[start:stop].astype('datetime64[D]')
+        return list(zip(dates.astype(str).tolist(), self.ratings[start:stop].tolist()))
+
+
+def _handler(index):
+    class RatingHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if url.path != '/rating' or 'fighter' not in query:
+                return self._reply(404, {'error': 'use /rating?fighter=...&date=...'})
+            try:
+                rating = index.as_of(query['fighter'], query.get('date'), query.get('include_day', 'true') != 'false')
+            except (KeyError, ValueError) as e:
+                return self._reply(400, {'error': str(e)})
+            self._reply(200, {'fighter': query['fighter'], 'date': query.get('date'), 'rating': rating})
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/ratings':
+                return self._reply(404, {'error': 'POST a JSON list of {"fighter", "date"} to /ratings'})
+            try:
+                queries = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                ratings = index.as_of_many([q['fighter'] for q in queries], [q['date'] for q in queries])
+            except (KeyError, ValueError, TypeError) as e:
+                return self._reply(400, {'error': str(e)})
+            self._reply(200, [None if np.isnan(r) else r.item() for r in ratings])
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet under heavy query load
+
+    return RatingHandler
+
+
+def serve(index, host='127.0.0.1', port=8000):
+    server = ThreadingHTTPServer((host, port), _handler(index))
+    print(f'Serving ratings on http://{host}:{server.server_address[1]}')
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Point-in-time fighter rating lookups')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='index a rating output (CSV or .cols store)')
+    build.add_argument('ratings_file')
+    build.add_argument('index_file')
+    query = commands.add_parser('query', help='rating of a fighter as of a date (latest without one)')
+    query.add_argument('index_file')
+    query.add_argument('fighter')
+    query.add_argument('date', nargs='?')
+    query.add_argument('--before', action='store_true', help='rating going into a fight on that date')
+    server = commands.add_parser('serve', help='answer queries over HTTP')
+    server.add_argument('index_file')
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        RatingIndex.from_frame(read_table(args.ratings_file)).save(args.index_file)
+        print(f'Rating index saved to {args.index_file}')
+    elif args.command == 'query':
+        index = RatingIndex.load(args.index_file)
+        try:
+            print(index.as_of(args.fighter, args.date, include_day=not args.before))
+        except (KeyError, ValueError) as e:
+            # Unknown fighters and unreadable dates, like the HTTP front end's 400s
+            print(f'query: {e.args[0]}', file=sys.stderr)
+            return 1
+    else:
+        serve(RatingIndex.load(args.index_file), args.host, args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import numpy as np
+from collections import OrderedDict
+
+from elo_engine import NO_WINNER, RED, EngineState, fight_history, replay
+
+
+'''
+Checkpoint cache for parameter sweeps that replay the same bouts many times.
+
+A bout only reads a few parameters: the multiplier of its win type, the K factors of
+the winner's and loser's fight-count buckets and, with decay on, the decay cap and
+(once the winner has fought before) the decay rate. Until a parameter is first read,
+candidates that differ only in it have identical engine state. The cache stores the
+state at the bout indices where a new parameter starts to matter, keyed by the values
+of the parameters read so far, and later candidates resume from the furthest match.
+'''
+
+
+class CheckpointCache:
+    def __init__(self, bouts, fight_offset=0, winner=None, use_decay=True, checkpoints=None, max_bytes=256 * 2 ** 20):
+        self.bouts = bouts
+        self.fight_offset = fight_offset
+        self.winner = bouts.winner if winner is None else np.asarray(winner)
+        self.use_decay = use_decay
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes_used = 0
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.bouts_replayed = 0
+        self.bouts_skipped = 0
+
+        # Parameter slots: one multiplier per win code, then k1, k2, k3, decay rate and decay cap
+        n_codes = len(bouts.win_types)
+        self.n_slots = n_codes + 5
+        first_use = np.full(self.n_slots, len(bouts.red))
+        red_fights, blue_fights, red_days, blue_days = fight_history(bouts)
+        red_wins = self.winner == RED
+        decided = self.winner != NO_WINNER
+        w_fights = np.where(red_wins, red_fights, blue_fights) + fight_offset
+        l_fights = np.where(red_wins, blue_fights, red_fights) + fight_offset
+        w_days = np.where(red_wins, red_days, blue_days)
+
+        def first(mask):
+            index = np.flatnonzero(mask & decided)
+            return index[0] if len(index) else len(bouts.red)
+
+        for code in range(n_codes):
+            first_use[code] = first(bouts.win_code == code)
+        for bucket, (low, high) in enumerate([(-np.inf, 3), (3, 5), (5, np.inf)]):
+            in_bucket = ((w_fights >= low) & (w_fights < high)) | ((l_fights >= low) & (l_fights < high))
+            first_use[n_codes + bucket] = first(in_bucket)
+        if use_decay:
+            first_use[n_codes + 3] = first(w_days > 0)
+            first_use[n_codes + 4] = first(np.ones(len(bouts.red), dtype=bool))
+        self.first_use = first_use
+
+        # By default checkpoint right before each parameter is first read, and at the end
+        if checkpoints is None:
+            checkpoints = np.append(first_use, len(bouts.red))
+        self.checkpoints = np.unique(np.clip(checkpoints, 1, len(bouts.red)))
+
+    def _slot_values(self, multipliers, k_factors, decay):
+        decay_rate, decay_cap = decay if decay is not None else (0.0, 0.0)
+        return np.concatenate([np.asarray(multipliers, dtype=np.float64),
+                               np.asarray(k_factors, dtype=np.float64),
+                               [decay_rate, decay_cap]])
+
+    def _key(self, index, values):
+        # Only the parameters read by bouts before index decide the state at index
+        return (int(index), tuple(values[self.first_use < index].tolist()))
+
+    def _store(self, key, state):
+        size = sum(array.nbytes for array in state)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = state
+        self.bytes_used += size
+        while self.bytes_used > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes_used -= sum(array.nbytes for array in evicted)
+            self.evictions += 1
+
+    def replay(self, multipliers, k_factors, decay=None, stop=None):
+        # Engine state after the first stop bouts, resumed from the furthest cached checkpoint
+        if stop is None:
+            stop = len(self.bouts.red)
+        values = self._slot_values(multipliers, k_factors, decay)
+        checkpoints = self.checkpoints[self.checkpoints <= stop]
+
+        self.lookups += 1
+        start, state = 0, None
+        for index in checkpoints[::-1]:
+            key = self._key(index, values)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                start, state = int(index), self.entries[key]
+                self.hits += 1
+                break
+        self.bouts_skipped += start
+
+        # Replay checkpoint to checkpoint so every state along the way can be stored
+        for index in checkpoints[checkpoints > start]:
+            result = replay(self.bouts, multipliers, k_factors, decay=decay if self.use_decay else None,
+                            fight_offset=self.fight_offset, winner=self.winner, state=state, start=start, stop=int(index))
+            self.bouts_replayed += int(index) - start
+            state = EngineState(result.ratings, result.fight_counts, result.last_day)
+            self._store(self._key(index, values), state)
+            start = int(index)
+        if start < stop:
+            result = replay(self.bouts, multipliers, k_factors, decay=decay if self.use_decay else None,
+                            fight_offset=self.fight_offset, winner=self.winner, state=state, start=start, stop=stop)
+            self.bouts_replayed += stop - start
+            state = EngineState(result.ratings, result.fight_counts, result.last_day)
+        return state
+
+    def stats(self):
+        total = self.bouts_replayed + self.bouts_skipped
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit rate': self.hits / self.lookups if self.lookups else 0.0,
+            'bouts replayed': self.bouts_replayed,
+            'bouts skipped': self.bouts_skipped,
+            'replay saved': self.bouts_skipped / total if total else 0.0,
+            'entries': len(self.entries),
+            'bytes used': self.bytes_used,
+            'evictions': self.evictions,
+        }
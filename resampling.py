@@ -0,0 +1,168 @@
+from collections import namedtuple
+from datetime import date
+import numpy as np
+import pandas as pd
+
+from date_ingest import day_number
+from elo_engine import BLUE, DEFAULT_ELO, NO_WINNER, RED, expected_scores
+from walk_forward import EPSILON
+
+
+'''
+Error bars for accuracies and forecasts without replaying the bouts again.
+
+bout_outcomes turns ratings (one column per parameter set) into per-bout arrays once:
+whether the pick was right and the log loss of the forecast. bootstrap then draws all the
+resamples as one matrix of bout indices, turns every block of rows into per-bout counts with
+a single bincount, and scores every parameter set on every resample with a matrix product.
+Intervals are percentiles over the resamples. Since all sets are scored on the same
+resamples, the gap to the best set and how often each set comes out on top show which grid
+points are really better and which only differ by noise.
+
+simulate_card plays an upcoming card many times from the current ratings of a LiveRatings.
+Every bout is one vectorized step over all simulations, with winners drawn from the expected
+scores and both ratings updated by the model's rules, so a fighter booked twice on a card
+goes into the second bout with the rating from the first.
+'''
+
+
+CardSimulation = namedtuple('CardSimulation', ['bouts', 'red_wins', 'favorite_wins'])
+
+
+def bout_outcomes(bouts, ratings):
+    # Per-bout correctness (bouts x sets) and log loss of the red corner's expected score, both
+    # from the final ratings like parameter_optimizer.accuracy_from_ratings, and which bouts had a
+    # winner. Bouts without one count as wrong picks and have no log loss
+    ratings = np.asarray(ratings)
+    if ratings.ndim == 1:
+        ratings = ratings[:, None]
+    red, blue = ratings[bouts.red], ratings[bouts.blue]
+    red_won = (bouts.winner == RED)[:, None]
+    blue_won = (bouts.winner == BLUE)[:, None]
+    correct = np.where(red - blue > 0, red_won, blue_won)
+
+    probability = np.clip(expected_scores(blue - red), EPSILON, 1 - EPSILON)
+    decided = bouts.winner != NO_WINNER
+    loss = np.where(red_won, -np.log(probability), -np.log1p(-probability))
+    loss[~decided] = 0
+    return correct, loss, decided
+
+
+def bootstrap(correct, loss, decided, n_resamples=10_000, confidence=0.95, seed=0, budget=10_000_000):
+    # Point estimate and percentile interval of accuracy (%) and log loss for every parameter set,
+    # the interval of its accuracy gap to the best set and the share of resamples it comes out on top.
+    # Resamples are drawn in blocks of at most budget bout indices, however long the history
+    correct = np.asarray(correct, dtype=np.float64).reshape(len(decided), -1)
+    loss = np.asarray(loss, dtype=np.float64).reshape(len(decided), -1)
+    n_bouts, n_sets = correct.shape
+    values = np.hstack([correct, loss, np.asarray(decided, dtype=np.float64)[:, None]])
+    rng = np.random.default_rng(seed)
+    chunk = max(1, budget // n_bouts)
+
+    accuracy = np.empty((n_resamples, n_sets))
+    log_loss = np.empty((n_resamples, n_sets))
+    for start in range(0, n_resamples, chunk):
+        rows = min(chunk, n_resamples - start)
+        # Each row of the index matrix is one resample, counted per bout in one bincount
+        index = rng.integers(0, n_bouts, size=(rows, n_bouts))
+        index += np.arange(rows)[:, None] * n_bouts
+        counts = np.bincount(index.ravel(), minlength=rows * n_bouts).reshape(rows, n_bouts)
+        totals = counts @ values
+        accuracy[start:start + rows] = totals[:, :n_sets] / n_bouts * 100
+        log_loss[start:start + rows] = totals[:, n_sets:2 * n_sets] / totals[:, -1:]
+
+    tails = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+    point = correct.mean(axis=0) * 100
+    best = np.argmax(point)
+    gap = accuracy - accuracy[:, [best]]
+    accuracy_low, accuracy_high = np.percentile(accuracy, tails, axis=0)
+    loss_low, loss_high = np.percentile(log_loss, tails, axis=0)
+    gap_low, gap_high = np.percentile(gap, tails, axis=0)
+    top = np.bincount(np.argmax(accuracy, axis=1), minlength=n_sets) / n_resamples
+
+    return pd.DataFrame({
+        'accuracy': point,
+        'accuracy low': accuracy_low,
+        'accuracy high': accuracy_high,
+        'log loss': loss[decided].mean(axis=0),
+        'log loss low': loss_low,
+        'log loss high': loss_high,
+        'gap to best low': gap_low,
+        'gap to best high': gap_high,
+        'share best': top,
+    })
+
+
+def _k_index(fights):
+    # Which of the three K factors a fight count uses
+    return 0 if fights < 3 else (1 if fights < 5 else 2)
+
+
+def simulate_card(live, card, n_simulations=10_000, on=None, win_types=None, seed=0):
+    # Play a card of (red, blue) fighter names n_simulations times from the current ratings of
+    # live, a LiveRatings. on is the card's date (today by default) for the decay model, and
+    # win_types maps win types to their share of results (e.g. from the bout history), their
+    # multipliers scaling the K factors; without it every result counts with multiplier 1.
+    # Returns per-bout probabilities and rating ranges, the (simulations x bouts) red wins and
+    # the distribution of how many favorites win
+    rng = np.random.default_rng(seed)
+    day = day_number(on if on is not None else date.today())
+    k_table = np.asarray(live.k_factors, dtype=np.float64)
+    decay_rate, decay_cap = live.decay if live.decay is not None else (0.0, 0.0)
+
+    # Every fighter on the card gets a column of ratings, one row per simulation
+    names = list(dict.fromkeys(name for bout in card for name in bout))
+    column = {name: i for i, name in enumerate(names)}
+    ids = [live.ids.get(name) for name in names]
+    start = np.array([DEFAULT_ELO if i is None else live.state.ratings[i] for i in ids], dtype=np.float64)
+    ratings = np.repeat(start[None, :], n_simulations, axis=0)
+    fights = np.array([0 if i is None else live.state.fight_counts[i] for i in ids], dtype=np.int64)
+    last_day = np.array([day if i is None else live.state.last_day[i] for i in ids], dtype=np.int64)
+
+    if win_types:
+        shares = np.array(list(win_types.values()), dtype=np.float64)
+        multipliers = np.array([live.multiplier_dict.get(win_type, 1.0) for win_type in win_types])
+        multiplier = rng.choice(multipliers, size=(n_simulations, len(card)), p=shares / shares.sum())
+    else:
+        multiplier = np.ones((n_simulations, len(card)))
+
+    red_wins = np.empty((n_simulations, len(card)), dtype=bool)
+    probability = np.empty(len(card))
+    rows = []
+    for b, (red_name, blue_name) in enumerate(card):
+        r, l = column[red_name], column[blue_name]
+        red, blue = ratings[:, r], ratings[:, l]
+        red_expected = expected_scores(blue - red)
+        probability[b] = red_expected.mean()
+        won = rng.random(n_simulations) < red_expected
+        red_wins[:, b] = won
+
+        # Same update as the replay kernel, with the winner's inactivity decaying both ratings
+        winner_elo, loser_elo = np.where(won, red, blue), np.where(won, blue, red)
+        if live.decay is not None:
+            inactive = np.where(won, day - last_day[r] if fights[r] else 0, day - last_day[l] if fights[l] else 0)
+            elo_decay = np.minimum(decay_rate * inactive, decay_cap)
+            winner_elo, loser_elo = winner_elo - elo_decay, loser_elo - elo_decay
+        k_red = k_table[_k_index(fights[r] + live.fight_offset)]
+        k_blue = k_table[_k_index(fights[l] + live.fight_offset)]
+        k_winner = np.where(won, k_red, k_blue) * multiplier[:, b]
+        k_loser = np.where(won, k_blue, k_red) * multiplier[:, b]
+        diff = np.where(won, blue - red, red - blue)
+        new_winner = np.rint(winner_elo + k_winner * (1 - expected_scores(diff)))
+        new_loser = np.rint(loser_elo - k_loser * expected_scores(-diff))
+        ratings[:, r] = np.where(won, new_winner, new_loser)
+        ratings[:, l] = np.where(won, new_loser, new_winner)
+        fights[[r, l]] += 1
+        last_day[[r, l]] = day
+
+        red_low, red_high = np.percentile(ratings[:, r], [5, 95])
+        blue_low, blue_high = np.percentile(ratings[:, l], [5, 95])
+        rows.append((red_name, blue_name, probability[b], won.mean(), ratings[:, r].mean(), red_low, red_high,
+                     ratings[:, l].mean(), blue_low, blue_high))
+
+    bouts = pd.DataFrame(rows, columns=['red fighter', 'blue fighter', 'red win prob', 'red win share',
+                                        'red elo after', 'red elo p5', 'red elo p95',
+                                        'blue elo after', 'blue elo p5', 'blue elo p95'])
+    favorite_won = np.where(probability >= 0.5, red_wins, ~red_wins)
+    favorite_wins = np.bincount(favorite_won.sum(axis=1), minlength=len(card) + 1) / n_simulations
+    return CardSimulation(bouts, red_wins, favorite_wins)
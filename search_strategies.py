@@ -0,0 +1,180 @@
+import numpy as np
+from collections import namedtuple
+
+
+'''
+Search strategies for the optimizer that cost far less than the exhaustive grid.
+
+Every strategy takes an objective and a search space:
+
+    objective(parameters, fraction=None) -> array of accuracies
+
+where parameters maps each parameter name to an array with one value per candidate,
+and fraction limits the replay to that share of the earliest bouts (used by successive halving).
+The space maps each parameter name to (low, high, type), with type int or float.
+budget is the number of candidate evaluations a strategy may spend.
+'''
+
+
+SearchResult = namedtuple('SearchResult', ['best_accuracy', 'best_parameters', 'evaluations'])
+
+
+def _sample_uniform(space, n, rng):
+    return _clip(space, {name: rng.uniform(low, high, n) for name, (low, high, kind) in space.items()})
+
+def _clip(space, parameters):
+    # Keep candidates inside the space and on whole numbers for integer parameters
+    clipped = {}
+    for name, (low, high, kind) in space.items():
+        values = np.clip(np.asarray(parameters[name], dtype=np.float64), low, high)
+        clipped[name] = np.round(values) if kind is int else values
+    return clipped
+
+def _take(parameters, index):
+    return {name: values[index] for name, values in parameters.items()}
+
+def _concat(batches):
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+
+class _Tracker:
+    # Counts evaluations against the budget and keeps the best candidate seen,
+    # later candidates win ties like the grid's `>=` comparison
+    def __init__(self, objective, budget):
+        self.objective = objective
+        self.budget = budget
+        self.evaluations = 0
+        self.best_accuracy = -np.inf
+        self.best_parameters = {}
+
+    def remaining(self):
+        return self.budget - self.evaluations
+
+    def evaluate(self, parameters, fraction=None):
+        accuracies = np.asarray(self.objective(parameters, fraction=fraction), dtype=np.float64)
+        self.evaluations += len(accuracies)
+        # Subsample scores are not comparable with full replays, only those count for the best
+        if fraction is None and len(accuracies):
+            i = len(accuracies) - 1 - np.argmax(accuracies[::-1])
+            if accuracies[i] >= self.best_accuracy:
+                self.best_accuracy = accuracies[i]
+                self.best_parameters = {name: values[i].item() for name, values in parameters.items()}
+        return accuracies
+
+    def result(self):
+        return SearchResult(self.best_accuracy, self.best_parameters, self.evaluations)
+
+
+def random_search(objective, space, budget, seed=0, batch_size=256):
+    # Uniform samples over the whole space, scored in batches
+    rng = np.random.default_rng(seed)
+    tracker = _Tracker(objective, budget)
+    while tracker.remaining() > 0:
+        tracker.evaluate(_sample_uniform(space, min(batch_size, tracker.remaining()), rng))
+    return tracker.result()
+
+
+def coordinate_descent(objective, space, budget, start=None, points=9, shrink=0.5):
+    # Line search along one parameter at a time around the current best, narrowing the
+    # search window after every pass over all parameters
+    tracker = _Tracker(objective, budget)
+    if start is None:
+        start = {name: (low + high) / 2 for name, (low, high, kind) in space.items()}
+    current = _clip(space, {name: np.array([start[name]]) for name in space})
+    current_accuracy = tracker.evaluate(current)[0]
+    width = {name: (high - low) / 2 for name, (low, high, kind) in space.items()}
+
+    names = [name for name, (low, high, kind) in space.items() if high > low]
+    while names and tracker.remaining() > 0:
+        for name in names:
+            n = min(points, tracker.remaining())
+            if n <= 0:
+                break
+            candidates = {key: np.repeat(values, n) for key, values in current.items()}
+            candidates[name] = current[name][0] + np.linspace(-width[name], width[name], n)
+            candidates = _clip(space, candidates)
+            accuracies = tracker.evaluate(candidates)
+            i = np.argmax(accuracies)
+            if accuracies[i] > current_accuracy:
+                current_accuracy = accuracies[i]
+                current = _take(candidates, slice(i, i + 1))
+        for name in names:
+            width[name] *= shrink
+    return tracker.result()
+
+
+def successive_halving(objective, space, budget, eta=3, rungs=3, seed=0):
+    # Score many random candidates on the earliest bouts only, then keep the best 1/eta
+    # and replay more of the history for the survivors until they see every bout
+    rng = np.random.default_rng(seed)
+    tracker = _Tracker(objective, budget)
+    fractions = [eta ** -rung for rung in reversed(range(rungs))]
+
+    # Largest first rung that fits the whole bracket in the budget
+    rung_share = sum(eta ** -rung for rung in range(rungs))
+    n = max(1, int(budget / rung_share))
+    candidates = _sample_uniform(space, n, rng)
+    for fraction in fractions:
+        n = min(len(candidates[next(iter(candidates))]), tracker.remaining())
+        if n <= 0:
+            break
+        candidates = _take(candidates, slice(0, n))
+        accuracies = tracker.evaluate(candidates, fraction=fraction if fraction < 1.0 else None)
+        keep = max(1, n // eta)
+        candidates = _take(candidates, np.argsort(-accuracies, kind='stable')[:keep])
+    return tracker.result()
+
+
+def tpe_search(objective, space, budget, seed=0, n_startup=64, batch_size=16, gamma=0.15, n_candidates=256):
+    # Tree-structured Parzen estimator: split the evaluated candidates into the best gamma
+    # share and the rest, model each parameter with a Gaussian kernel density for both groups
+    # and pick the samples from the good density where good / bad density is highest
+    rng = np.random.default_rng(seed)
+    tracker = _Tracker(objective, budget)
+    names = list(space)
+
+    observed = [_sample_uniform(space, min(n_startup, budget), rng)]
+    scores = [tracker.evaluate(observed[0])]
+    while tracker.remaining() > 0:
+        parameters = _concat(observed)
+        accuracies = np.concatenate(scores)
+        order = np.argsort(-accuracies, kind='stable')
+        n_good = max(1, int(np.ceil(gamma * len(order))))
+        good, bad = order[:n_good], order[n_good:]
+
+        n = min(batch_size, tracker.remaining())
+        proposal = {}
+        log_ratio = np.zeros((n, n_candidates))
+        for name in names:
+            low, high, kind = space[name]
+            values = parameters[name]
+            if high <= low:
+                proposal[name] = np.full((n, n_candidates), low)
+                continue
+            bandwidth = (high - low) * len(values) ** -0.2 / 4
+            # Draw from the good density, a kernel around a random good observation
+            centres = rng.choice(values[good], size=(n, n_candidates))
+            samples = np.clip(centres + rng.normal(0, bandwidth, size=centres.shape), low, high)
+            proposal[name] = samples
+            log_ratio += np.log(_kde(samples, values[good], bandwidth)) - np.log(_kde(samples, values[bad], bandwidth))
+
+        pick = np.argmax(log_ratio, axis=1)
+        batch = _clip(space, {name: proposal[name][np.arange(n), pick] for name in names})
+        observed.append(batch)
+        scores.append(tracker.evaluate(batch))
+    return tracker.result()
+
+def _kde(samples, centres, bandwidth):
+    # Gaussian kernel density of centres evaluated at samples, with a floor so empty groups stay finite
+    if len(centres) == 0:
+        return np.ones_like(samples)
+    z = (samples[..., None] - centres) / bandwidth
+    return np.exp(-0.5 * z * z).mean(axis=-1) + 1e-12
+
+
+strategies = {
+    'random': random_search,
+    'coordinate': coordinate_descent,
+    'halving': successive_halving,
+    'tpe': tpe_search,
+}
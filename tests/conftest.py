@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules live at the top of the repository, next to this directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CLEANED_DATA = os.path.join(ROOT, 'cleaned_ufc_data_with_finish.csv')
@@ -0,0 +1,13 @@
+import cli
+
+
+def test_clean_fails_on_missing_input(tmp_path, capsys):
+    assert cli.main(['clean', str(tmp_path / 'missing.csv'), str(tmp_path / 'out.csv')]) == 1
+    assert 'missing.csv' in capsys.readouterr().err
+
+
+def test_clean_fails_on_input_without_the_raw_columns(tmp_path, capsys):
+    raw = tmp_path / 'raw.csv'
+    raw.write_text('a,b\n1,2\n')
+    assert cli.main(['clean', str(raw), str(tmp_path / 'out.csv')]) == 1
+    assert capsys.readouterr().err.startswith('clean: ')
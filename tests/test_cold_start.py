@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+from cold_start import CASES, LAZY_MODULES, run_case
+
+
+# Only the imports are checked here, the start-up times depend on the machine and its load and
+# are left to the benchmark's budgets
+@pytest.mark.parametrize('name, arguments', [case[:2] for case in CASES], ids=[case[0] for case in CASES])
+def test_commands_load_no_lazy_module(name, arguments):
+    _, loaded = run_case(arguments, 1)
+    assert not loaded, f"{name} loaded {', '.join(loaded)}, which only some commands need"
+
+
+def test_lazy_modules_are_reported():
+    # The check itself must see a lazy library that is imported
+    _, loaded = run_case(['-c', f'import {LAZY_MODULES[-1]}'], 1)
+    assert loaded == [LAZY_MODULES[-1]]
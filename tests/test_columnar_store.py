@@ -0,0 +1,41 @@
+import filecmp
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import read_table, write_table, write_table_chunks
+
+
+def _frame(n, seed):
+    rng = np.random.default_rng(seed)
+    names = np.array([f'Fighter {i}' for i in range(40)], dtype=object)
+    return pd.DataFrame({
+        'R_fighter': rng.choice(names, n),
+        'B_fighter': rng.choice(names, n),
+        'date': pd.to_datetime('2000-01-01') + pd.to_timedelta(rng.integers(0, 9000, n), unit='D'),
+        'Winner': rng.choice(np.array(['Red', 'Blue', None], dtype=object), n),
+        'R_odds': np.where(rng.random(n) < 0.2, np.nan, rng.integers(-400, 400, n)),
+        'elo': rng.integers(800, 1400, n),
+    })
+
+
+def test_chunked_store_matches_whole_store(tmp_path):
+    chunks = [_frame(n, seed) for seed, n in enumerate([50, 0, 120, 7])]
+    for reverse in (False, True):
+        whole, chunked = tmp_path / f'whole{reverse}.cols', tmp_path / f'chunked{reverse}.cols'
+        ordered = chunks[::-1] if reverse else chunks
+        write_table(pd.concat(ordered, ignore_index=True), os.fspath(whole))
+        assert write_table_chunks(iter(chunks), os.fspath(chunked), reverse=reverse) == 177
+
+        files = sorted(os.listdir(whole))
+        assert files == sorted(os.listdir(chunked))
+        assert filecmp.cmpfiles(whole, chunked, files, shallow=False)[0] == files
+        pd.testing.assert_frame_equal(read_table(os.fspath(whole)), read_table(os.fspath(chunked)))
+    # Only the finished stores are left, no spilled parts
+    assert len(os.listdir(tmp_path)) == 4
+
+
+def test_no_chunks_writes_nothing(tmp_path):
+    assert write_table_chunks(iter([]), os.fspath(tmp_path / 'empty.cols')) == 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,39 @@
+import numpy as np
+
+from elo_engine import EXPECTED_SCORE_TABLE, MAX_RATING_DIFF, _expected_score, expected_scores
+
+
+def formula(diff):
+    return 1 / (1 + 10 ** (diff / 400))
+
+
+def test_table_matches_formula_at_every_difference():
+    diffs = range(-MAX_RATING_DIFF, MAX_RATING_DIFF + 1)
+    assert len(EXPECTED_SCORE_TABLE) == 2 * MAX_RATING_DIFF + 1
+    assert EXPECTED_SCORE_TABLE.tolist() == [formula(d) for d in diffs]
+
+
+def test_scalar_kernel_matches_formula_at_every_difference():
+    for d in range(-MAX_RATING_DIFF, MAX_RATING_DIFF + 1):
+        assert _expected_score(d) == formula(d)
+        assert _expected_score(float(d)) == formula(d)
+
+
+def test_vectorized_matches_formula_at_every_difference():
+    diffs = np.arange(-MAX_RATING_DIFF, MAX_RATING_DIFF + 1)
+    expected = [formula(d) for d in diffs.tolist()]
+    assert expected_scores(diffs).tolist() == expected
+    assert expected_scores(diffs.astype(np.float64)).tolist() == expected
+    assert expected_scores(diffs.reshape(1, -1)).shape == (1, len(diffs))
+
+
+def test_differences_outside_the_table_use_the_formula():
+    # Past MAX_RATING_DIFF the index is clamped to the table's ends for the lookup, but the
+    # score itself is computed, not taken from the nearest end
+    diffs = [-MAX_RATING_DIFF - 1, MAX_RATING_DIFF + 1, -6000, 6000, -20000, 20000]
+    expected = [formula(d) for d in diffs]
+    assert [_expected_score(d) for d in diffs] == expected
+    assert expected_scores(np.array(diffs)).tolist() == expected
+    assert expected_scores(np.array([MAX_RATING_DIFF + 1]))[0] != EXPECTED_SCORE_TABLE[-1]
+    assert expected_scores(np.array([-20000]))[0] == 1.0
+    assert 0.0 <= expected_scores(np.array([20000]))[0] < EXPECTED_SCORE_TABLE[-1]
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+from elo_engine import BLUE, NO_WINNER, RED, Bouts
+from glicko_engine import GLICKO_SCALE, glicko_replay
+
+
+def _bouts(n_fighters, red, blue, winner, day):
+    n = len(red)
+    return Bouts([f'F{i}' for i in range(n_fighters)], np.asarray(red, dtype=np.int32),
+                 np.asarray(blue, dtype=np.int32), np.asarray(winner, dtype=np.int8), np.zeros(n, dtype=np.int8),
+                 [], np.asarray(day, dtype=np.int32))
+
+
+def _reference(n_fighters, red, blue, winner, day, tau=0.5, deviation=350.0, volatility=0.06):
+    # Glicko-2 from Glickman's paper, one rating period per date, written period by period.
+    # A fighter's deviation grows by a step for every period sat out, when they next fight
+    mu = [0.0] * n_fighters
+    phi = [deviation / GLICKO_SCALE] * n_fighters
+    sigma = [volatility] * n_fighters
+    last = [None] * n_fighters
+    g = lambda p: 1 / math.sqrt(1 + 3 * p * p / math.pi ** 2)
+
+    for period, d in enumerate(sorted(set(day))):
+        bouts = [i for i in range(len(day)) if day[i] == d]
+        for f in {f for i in bouts for f in (red[i], blue[i])}:
+            if last[f] is not None and last[f] < period - 1:
+                phi[f] = math.sqrt(phi[f] ** 2 + (period - 1 - last[f]) * sigma[f] ** 2)
+        games = {}
+        for i in bouts:
+            if winner[i] != NO_WINNER:
+                score = 1.0 if winner[i] == RED else 0.0
+                games.setdefault(red[i], []).append((blue[i], score))
+                games.setdefault(blue[i], []).append((red[i], 1 - score))
+        updated = {}
+        for f, played in games.items():
+            v_inverse = delta_sum = 0.0
+            for o, score in played:
+                e = 1 / (1 + math.exp(-g(phi[o]) * (mu[f] - mu[o])))
+                v_inverse += g(phi[o]) ** 2 * e * (1 - e)
+                delta_sum += g(phi[o]) * (score - e)
+            v = 1 / v_inverse
+            delta = v * delta_sum
+            a = math.log(sigma[f] ** 2)
+            fx = lambda x: (math.exp(x) * (delta ** 2 - phi[f] ** 2 - v - math.exp(x))
+                            / (2 * (phi[f] ** 2 + v + math.exp(x)) ** 2) - (x - a) / tau ** 2)
+            big_a = a
+            if delta ** 2 > phi[f] ** 2 + v:
+                big_b = math.log(delta ** 2 - phi[f] ** 2 - v)
+            else:
+                k = 1
+                while fx(a - k * tau) < 0:
+                    k += 1
+                big_b = a - k * tau
+            f_a, f_b = fx(big_a), fx(big_b)
+            while abs(big_b - big_a) > 1e-6:
+                big_c = big_a + (big_a - big_b) * f_a / (f_b - f_a)
+                f_c = fx(big_c)
+                if f_c * f_b <= 0:
+                    big_a, f_a = big_b, f_b
+                else:
+                    f_a /= 2
+                big_b, f_b = big_c, f_c
+            new_sigma = math.exp(big_a / 2)
+            phi_star = math.sqrt(phi[f] ** 2 + new_sigma ** 2)
+            new_phi = 1 / math.sqrt(1 / phi_star ** 2 + 1 / v)
+            updated[f] = (mu[f] + new_phi ** 2 * delta_sum, new_phi, new_sigma)
+        for f in {f for i in bouts for f in (red[i], blue[i])}:
+            if f in updated:
+                mu[f], phi[f], sigma[f] = updated[f]
+                last[f] = period
+            elif last[f] is None or last[f] < period - 1:
+                last[f] = period - 1
+    return 1000 + GLICKO_SCALE * np.array(mu), GLICKO_SCALE * np.array(phi)
+
+
+def test_fighter_on_consecutive_cards():
+    # A beats B on one card and C on the next, the first card's totals must not carry over
+    result = glicko_replay(_bouts(3, [0, 0], [1, 2], [RED, RED], [1, 2]))
+    assert round(result.ratings[0], 1) == 1250.5
+
+
+def test_matches_reference_over_many_periods():
+    rng = np.random.default_rng(0)
+    n_fighters, n_bouts = 12, 300
+    red = rng.integers(0, n_fighters, n_bouts)
+    blue = (red + rng.integers(1, n_fighters, n_bouts)) % n_fighters
+    winner = rng.choice([RED, BLUE, NO_WINNER], n_bouts, p=[0.55, 0.4, 0.05])
+    day = np.sort(rng.integers(0, 120, n_bouts))
+
+    result = glicko_replay(_bouts(n_fighters, red, blue, winner, day))
+    ratings, deviations = _reference(n_fighters, red.tolist(), blue.tolist(), winner.tolist(), day.tolist())
+    np.testing.assert_allclose(result.ratings, ratings, atol=1e-6)
+    np.testing.assert_allclose(result.deviations, deviations, atol=1e-6)
@@ -0,0 +1,22 @@
+import instrumentation
+from instrumentation import profiled
+
+
+@profiled('test.decorated_before_enable')
+def _work(x):
+    return x * 2
+
+
+def test_profiled_checks_on_every_call():
+    instrumentation.reset()
+    assert _work(1) == 2
+    assert 'test.decorated_before_enable' not in instrumentation.summary()
+
+    instrumentation.enable()
+    try:
+        assert _work(2) == 4
+        assert _work(3) == 6
+    finally:
+        instrumentation.disable()
+    assert instrumentation.summary()['test.decorated_before_enable']['calls'] == 2
+    instrumentation.reset()
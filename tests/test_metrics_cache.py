@@ -0,0 +1,28 @@
+import json
+import os
+
+import numpy as np
+
+import elo_finish_simple
+from comparative_analysis_finish import compute_metrics
+from conftest import CLEANED_DATA
+
+
+def test_metrics_refresh_when_a_store_column_is_rewritten(tmp_path):
+    store = os.fspath(tmp_path / 'elo_scores_simple.cols')
+    metrics_file = os.fspath(tmp_path / 'model_metrics.json')
+    elo_finish_simple.calculate_elo(CLEANED_DATA, store)
+    before = compute_metrics([store], metrics_file)['models']['elo_scores_simple']
+    written = os.path.getmtime(metrics_file)
+
+    # Flip every initial rating of the red corner in place. Only that file's time moves on,
+    # the store directory keeps its old one
+    with open(os.path.join(store, 'columns.json')) as f:
+        column = next(c for c in json.load(f)['columns'] if c['name'] == 'red fighter initial elo')
+    path = os.path.join(store, column['file'])
+    np.save(path, 2000 - np.load(path))
+    os.utime(path, (written + 10, written + 10))
+    os.utime(store, (written - 10, written - 10))
+
+    after = compute_metrics([store], metrics_file)['models']['elo_scores_simple']
+    assert after['auc'] != before['auc']
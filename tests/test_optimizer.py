@@ -0,0 +1,28 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import write_table
+from conftest import CLEANED_DATA
+from parameter_optimizer import calculate_accuracy_by_elo_diff, calculate_elo, optimize
+
+# Two points around the recorded best parameters, in GRID_AXES order
+AXES = [np.array([0.9]), np.array([-101]), np.array([1.8]), np.array([1.4]), np.array([1.0]),
+        np.array([251, 301]), np.array([201])]
+
+
+def test_optimize_reads_the_column_store_like_the_csv(tmp_path, capsys):
+    store = os.fspath(tmp_path / 'cleaned.cols')
+    write_table(pd.read_csv(CLEANED_DATA), store)
+    options = dict(axes=AXES, workers=1, show_walk_forward=False, show_intervals=0)
+    from_csv = optimize(CLEANED_DATA, **options)
+    assert optimize(store, **options) == from_csv
+    assert from_csv[0] >= 67.5857843137255
+
+
+def test_calculate_elo_leaves_the_frame_alone():
+    df = pd.read_csv(CLEANED_DATA)
+    scored = calculate_elo(df, 0.9, -101, 1.8, 1.8, 1, 1.4, 1.0, 1.0, 1.0, 301, 201, 1)
+    assert calculate_accuracy_by_elo_diff(scored) == 67.5857843137255
+    assert df.equals(pd.read_csv(CLEANED_DATA))
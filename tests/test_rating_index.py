@@ -0,0 +1,21 @@
+import os
+
+import elo_finish_simple
+import rating_index
+from conftest import CLEANED_DATA
+
+
+def test_query_errors_exit_non_zero(tmp_path, capsys):
+    ratings, index = os.fspath(tmp_path / 'ratings.csv'), os.fspath(tmp_path / 'index.npz')
+    elo_finish_simple.calculate_elo(CLEANED_DATA, ratings)
+    assert rating_index.main(['build', ratings, index]) == 0
+    capsys.readouterr()
+
+    assert rating_index.main(['query', index, 'Jon Jones', '2015-01-01']) == 0
+    assert int(capsys.readouterr().out) > 0
+
+    assert rating_index.main(['query', index, 'Nobody At All']) == 1
+    assert capsys.readouterr().err == 'query: Unknown fighter: Nobody At All\n'
+
+    assert rating_index.main(['query', index, 'Jon Jones', 'not a date']) == 1
+    assert capsys.readouterr().err.startswith('query: ')
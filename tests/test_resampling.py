@@ -0,0 +1,38 @@
+import numpy as np
+
+from conftest import CLEANED_DATA
+from elo_engine import load_bouts, prepare_bouts
+from parameter_optimizer import calculate_accuracy_batch, calculate_ratings_batch
+from resampling import bootstrap, bout_outcomes
+
+# (decay rate, decay cap, sub/ko, udec, other, k1, k2) of three parameter sets
+PARAMETERS = ([0.0, 0.5, 0.9], [0, -50, -101], [1.0, 1.4, 1.8], [1.0, 1.2, 1.4], [1.0, 0.9, 1.0],
+              [32, 150, 301], [32, 100, 201])
+
+
+def _outcomes():
+    bouts = prepare_bouts(load_bouts(CLEANED_DATA))
+    decay_rate, decay_cap, sub, udec, other, k1, k2 = [np.array(values) for values in PARAMETERS]
+    arguments = (decay_rate, decay_cap, sub, sub, 1, udec, other, other, other, k1, k2, 1)
+    accuracy = calculate_accuracy_batch(bouts, *arguments)
+    return accuracy, bout_outcomes(bouts, calculate_ratings_batch(bouts, *arguments))
+
+
+def test_point_estimate_matches_calculate_accuracy():
+    accuracy, outcomes = _outcomes()
+    intervals = bootstrap(*outcomes, n_resamples=200)
+    assert np.allclose(intervals['accuracy'], accuracy)
+    assert (intervals['accuracy low'] <= intervals['accuracy']).all()
+    assert (intervals['accuracy'] <= intervals['accuracy high']).all()
+
+
+def test_resamples_are_repeatable():
+    # A seed always draws the same resamples, whatever the block size, so the intervals agree too
+    _, outcomes = _outcomes()
+    first = bootstrap(*outcomes, n_resamples=50, seed=3)
+    assert first.equals(bootstrap(*outcomes, n_resamples=50, seed=3))
+    per_row = bootstrap(*outcomes, n_resamples=50, seed=3, budget=1)
+    # Counts of correct picks add up exactly, summed log losses only up to rounding
+    exact = ['accuracy low', 'accuracy high', 'gap to best low', 'gap to best high', 'share best']
+    assert per_row[exact].equals(first[exact])
+    assert np.allclose(per_row, first, rtol=1e-12, atol=0)
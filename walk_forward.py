@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from elo_engine import NO_WINNER, RED, expected_scores, replay
+from instrumentation import profiled
+
+
+'''
+Walk-forward evaluation of a rating model.
+
+The replay records both ratings going into every bout, so the red corner's expected
+score at that point is a forecast made from earlier bouts only. One replay gives the
+forecast for every bout, and the per-bout scores are summed per season with a single
+bincount. Running totals over the seasons give the expanding-window figures, so testing
+season Y + 1 after training on everything up to Y, for every Y, needs no extra replay.
+
+Bouts without a winner are not scored. A forecast above 0.5 picks red and anything
+else picks blue, like the accuracy in parameter_optimizer.
+'''
+
+
+# Forecasts are clipped this far from 0 and 1 so log loss stays finite
+EPSILON = 1e-15
+
+
+def expected_score(red_elo, blue_elo):
+    # Logistic expected score of the red corner, from the engine's lookup table for whole ratings
+    diff = np.asarray(blue_elo) - np.asarray(red_elo)
+    if diff.dtype.kind in 'iu':
+        return expected_scores(diff)
+    return 1 / (1 + 10 ** (diff.astype(np.float64) / 400))
+
+
+def season_report(day, winner, probabilities, seasons=None):
+    # Accuracy, log loss and Brier score of the forecasts per season (calendar year of day by
+    # default), and over every bout up to and including each season
+    if seasons is None:
+        seasons = np.asarray(day).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    decided = np.asarray(winner) != NO_WINNER
+    red_won = (np.asarray(winner) == RED)[decided]
+    p = np.asarray(probabilities, dtype=np.float64)[decided]
+
+    correct = np.where(p > 0.5, red_won, ~red_won)
+    clipped = np.clip(p, EPSILON, 1 - EPSILON)
+    log_loss = -np.where(red_won, np.log(clipped), np.log1p(-clipped))
+    brier = (p - red_won) ** 2
+
+    codes, labels = pd.factorize(np.asarray(seasons)[decided], sort=True)
+    bouts = np.bincount(codes, minlength=len(labels))
+    totals = {name: np.bincount(codes, weights=values, minlength=len(labels))
+              for name, values in [('accuracy', correct), ('log_loss', log_loss), ('brier', brier)]}
+
+    seen = np.cumsum(bouts)
+    report = pd.DataFrame({'season': labels, 'bouts': bouts, 'train_bouts': seen - bouts})
+    for name, total in totals.items():
+        report[name] = total / bouts
+    for name, total in totals.items():
+        report[f'expanding_{name}'] = np.cumsum(total) / seen
+    report['accuracy'] *= 100
+    report['expanding_accuracy'] *= 100
+    return report
+
+
+@profiled('evaluate.walk_forward')
+def walk_forward(bouts, multipliers, seasons=None, **replay_options):
+    # One replay of the bouts (with their real winners) recording the pre-fight forecasts.
+    # Returns the red corner's expected score for every bout and the season report
+    result = replay(bouts, multipliers, **replay_options)
+    probabilities = expected_score(result.red_initial, result.blue_initial)
+    winner = replay_options.get('winner')
+    if winner is None:
+        winner = bouts.winner
+    return probabilities, season_report(bouts.day, winner, probabilities, seasons)